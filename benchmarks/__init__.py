@@ -0,0 +1,3 @@
+"""
+Performance measurements for the engine, each module can be run with python -m benchmarks.<module>
+"""
@@ -0,0 +1,138 @@
+"""
+Long running soak test: keeps spawning and destroying colliding objects for many simulated minutes and reports
+memory usage and frame cost per interval. Memory and frame time should stay flat once the scene reaches
+its steady state
+
+Usage: python -m benchmarks.soak [--minutes 30] [--interval 60] [--no-tracemalloc]
+"""
+import argparse
+import random
+import tracemalloc
+from timeit import default_timer
+from engine import Scene, GameObject, components
+from engine.math import Vector2
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class _Lifetime(components.BaseComponent):
+    def __init__(self, length):
+        super(_Lifetime, self).__init__()
+        self.end = None
+        self.length = length
+
+    def start(self):
+        self.end = self.scene.time + self.length
+
+    def update(self):
+        if self.scene.time >= self.end:
+            self.game_object.destroy()
+
+
+def _rss_bytes():
+    """
+    :return: Current resident set size in bytes, None if it cannot be determined on this platform
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+
+    if resource is not None:
+        # Peak, not current, usage. Kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+def _spawn(scene, rng, count, lifetime):
+    objects = []
+    for index in range(0, count):
+        position = Vector2(rng.uniform(0, 8000), rng.uniform(0, 4000))
+        objects.append(GameObject(components.Transform(position=position), components.StaticBoundingRectangle(40, 40),
+                                  components.Collider(), _Lifetime(lifetime)))
+    scene.add_objects(objects)
+
+
+def run(minutes, interval, fps=60, spawn_per_frame=5, lifetime=2.0, trace=True, report=print):
+    """
+    Runs the soak test
+
+    :param float minutes: Simulated time to run for
+    :param float interval: Simulated seconds between reports
+    :param int fps: Simulated frames per second
+    :param int spawn_per_frame: Objects spawned every frame
+    :param float lifetime: Seconds every object lives for
+    :param bool trace: Takes tracemalloc snapshots if True
+    :param report: Callable receiving a report line
+    :return: List of dictionaries, one per interval
+    """
+    scene = Scene(None)
+    rng = random.Random(0)
+    dt = 1.0 / fps
+    frames_per_interval = max(int(interval * fps), 1)
+    total_frames = int(minutes * 60 * fps)
+
+    if trace:
+        tracemalloc.start()
+    previous_snapshot = None
+
+    results = []
+    frame_time = 0.0
+    for frame in range(0, total_frames):
+        start = default_timer()
+        _spawn(scene, rng, spawn_per_frame, lifetime)
+        scene.setup_frame(dt)
+        scene.simulate_preframe()
+        scene.simulate_postframe()
+        frame_time += default_timer() - start
+
+        if (frame + 1) % frames_per_interval == 0:
+            result = {
+                "time": scene.time,
+                "objects": len(scene.objects),
+                "frame_ms": frame_time * 1000 / frames_per_interval,
+                "rss": _rss_bytes(),
+            }
+            line = "t={time:8.1f}s objects={objects:6d} frame={frame_ms:7.3f}ms rss={rss}".format(**result)
+
+            if trace:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                result["traced_current"] = current
+                result["traced_peak"] = peak
+                line += " traced={0} peak={1}".format(current, peak)
+                if previous_snapshot is not None:
+                    result["top_growth"] = [str(x) for x in snapshot.compare_to(previous_snapshot, "lineno")[:3]]
+                previous_snapshot = snapshot
+
+            report(line)
+            for growth in result.get("top_growth", []):
+                report("    " + growth)
+
+            results.append(result)
+            frame_time = 0.0
+
+    if trace:
+        tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spawn/destroy soak benchmark")
+    parser.add_argument("--minutes", type=float, default=30, help="Simulated minutes to run for")
+    parser.add_argument("--interval", type=float, default=60, help="Simulated seconds between reports")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--spawn-per-frame", type=int, default=5)
+    parser.add_argument("--lifetime", type=float, default=2.0, help="Seconds every spawned object lives for")
+    parser.add_argument("--no-tracemalloc", dest="trace", action="store_false")
+    args = parser.parse_args()
+
+    run(args.minutes, args.interval, args.fps, args.spawn_per_frame, args.lifetime, args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures how long it takes to queue, spawn and remove large numbers of objects
+
+Usage: python -m benchmarks.spawn [count ...]
+"""
+import argparse
+from timeit import default_timer
+from engine import Scene, GameObject, components
+
+
+DEFAULT_COUNTS = [10000, 100000]
+
+
+def _create_objects(count):
+    objects = []
+    for index in range(0, count):
+        obj = GameObject(components.Transform())
+        obj.name = "object{0}".format(index % 100)
+        objects.append(obj)
+    return objects
+
+
+def _time(function, *args):
+    start = default_timer()
+    function(*args)
+    return default_timer() - start
+
+
+def run(count):
+    """
+    Spawns and removes count objects, one by one and in bulk
+
+    :param int count: Number of objects to spawn
+    :return: Dictionary of timings, in seconds
+    """
+    results = {}
+
+    scene = Scene(None)
+    objects = _create_objects(count)
+    results["add_object"] = _time(lambda: [scene.add_object(x) for x in objects])
+    results["spawn"] = _time(scene.setup_frame, 0.0)
+    results["remove_object"] = _time(lambda: [scene.remove_object(x) for x in objects])
+
+    scene = Scene(None)
+    objects = _create_objects(count)
+    results["add_objects"] = _time(scene.add_objects, objects)
+    results["remove_queued_objects"] = _time(scene.remove_objects, objects)
+    scene.add_objects(objects)
+    scene.setup_frame(0.0)
+    results["remove_objects"] = _time(scene.remove_objects, objects)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scene spawn benchmark")
+    parser.add_argument("counts", nargs="*", type=int, default=DEFAULT_COUNTS)
+    args = parser.parse_args()
+
+    for count in args.counts:
+        results = run(count)
+        print("{0} objects".format(count))
+        for name, value in results.items():
+            print("  {0:<24}{1:>10.2f} ms  {2:>8.2f} us/object".format(name, value * 1000, value * 1e6 / count))
+
+
+if __name__ == "__main__":
+    main()
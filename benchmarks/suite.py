@@ -0,0 +1,456 @@
+"""
+Engine benchmark suite. Builds synthetic scenes (and scaled up copies of level01) and times the engine's hot paths
+at several sizes. Results are written as JSON and can be compared against a stored baseline to catch regressions
+
+Usage:
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --compare baseline.json [--threshold 0.2]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+from timeit import default_timer
+
+import pygame
+
+from engine import Application, Scene, GameObject, Renderer, components, tiledmap
+from engine.math import Rect, Vector2
+from game.components import CharacterController
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEVEL_PATH = os.path.join(ROOT, "assets", "levels", "level01.tmx")
+PLAYER_SPRITESHEET = os.path.join(ROOT, "assets", "spritesheets", "p1_spritesheet.png")
+PLAYER_ANIMATIONS = os.path.join(ROOT, "assets", "spritesheets", "p1_anims.json")
+
+SCREEN_SIZE = (1440, 900)
+OBJECT_COUNTS = [10, 100, 1000]
+QUICK_OBJECT_COUNTS = [10, 100]
+MAP_SCALES = [1, 2, 4]
+QUICK_MAP_SCALES = [1, 2]
+# Map used for every case which needs a map but does not measure its size
+DEFAULT_MAP_SCALE = 2
+# Square maps, in tiles, on which tile rendering modes are compared
+TILE_MAP_SIZES = [100, 300, 1000]
+QUICK_TILE_MAP_SIZES = [100, 300]
+# Drawing every tile of larger maps would take seconds per frame
+ALL_TILES_MAX_SIZE = 100
+# Internal resolutions, relative to the screen, of scaled rendering
+RENDER_SCALES = [1.0, 0.75, 0.5]
+
+
+def write_scaled_level(scale, directory, source=LEVEL_PATH):
+    """
+    Writes a copy of a level with its tile layers repeated scale times in both directions. Object groups are left out
+    so that the map can be spawned without any game specific setup
+
+    :param int scale: How many times to repeat the map horizontally and vertically
+    :param str directory: Directory to write the level to
+    :param str source: Path of the level to scale
+    :return: Path to the written level
+    """
+    root = ElementTree.parse(source).getroot()
+    width = int(root.get("width"))
+    height = int(root.get("height"))
+    path = os.path.join(directory, "level01_x{0}.tmx".format(scale))
+    return write_sized_level(width * scale, height * scale, path, source)
+
+
+def write_sized_level(width, height, path, source=LEVEL_PATH):
+    """
+    Writes a copy of a level with its tile layers repeated or cut to the given size in tiles. Object groups are left
+    out so that the map can be spawned without any game specific setup
+
+    :param int width: Width of the new level in tiles
+    :param int height: Height of the new level in tiles
+    :param str path: Path to write the level to
+    :param str source: Path of the level to copy
+    :return: Path to the written level
+    """
+    tree = ElementTree.parse(source)
+    root = tree.getroot()
+    source_width = int(root.get("width"))
+    source_height = int(root.get("height"))
+    root.set("width", str(width))
+    root.set("height", str(height))
+
+    source_directory = os.path.dirname(os.path.abspath(source))
+    for image in root.iter("image"):
+        image.set("source", os.path.normpath(os.path.join(source_directory, image.get("source"))))
+
+    for group in root.findall("objectgroup"):
+        root.remove(group)
+
+    for layer in root.findall("layer"):
+        data = layer.find("data")
+        if data.get("encoding") == "csv":
+            gids = [int(x) for x in data.text.replace("\n", "").split(",")]
+        else:
+            gids = [int(x.get("gid")) for x in data.findall("tile")]
+        source_rows = [gids[y * source_width:(y + 1) * source_width] for y in range(0, source_height)]
+        repeats = -(-width // source_width)
+        rows = [(source_rows[y % source_height] * repeats)[:width] for y in range(0, height)]
+
+        layer.set("width", str(width))
+        layer.set("height", str(height))
+        layer.remove(data)
+        data = ElementTree.SubElement(layer, "data", encoding="csv")
+        data.text = "\n" + ",\n".join(",".join(str(x) for x in row) for row in rows) + "\n"
+
+    tree.write(path, encoding="UTF-8", xml_declaration=True)
+    return path
+
+
+class Benchmark(object):
+    """
+    Runs benchmark cases and collects their results
+
+    :type min_time: float
+    :type max_repeats: int
+    :type results: dict
+    """
+    def __init__(self, min_time=0.5, max_repeats=1000, case_filter=None, report=print):
+        self.min_time = min_time
+        self.max_repeats = max_repeats
+        self.case_filter = case_filter
+        self.report = report
+        self.results = {}
+
+    def run(self, name, function, number=1):
+        """
+        Times the function repeatedly until min_time has passed or max_repeats was hit
+
+        :param str name: Name of the case, used as a key in the results
+        :param function: Callable to time
+        :param int number: Operations performed by a single call, timings are reported per operation
+        """
+        if self.case_filter is not None and self.case_filter not in name:
+            return
+
+        function()
+
+        timings = []
+        total = 0.0
+        while total < self.min_time and len(timings) < self.max_repeats:
+            start = default_timer()
+            function()
+            elapsed = default_timer() - start
+            total += elapsed
+            timings.append(elapsed / number)
+
+        timings.sort()
+        result = {
+            "median_ms": timings[len(timings) // 2] * 1000,
+            "min_ms": timings[0] * 1000,
+            "mean_ms": sum(timings) / len(timings) * 1000,
+            "repeats": len(timings),
+        }
+        self.results[name] = result
+        self.report("{0:<40}{1:>12.4f} ms (min {2:.4f} ms, {3} runs)".format(
+            name, result["median_ms"], result["min_ms"], result["repeats"]))
+
+    def wants(self, prefix):
+        """
+        :return: False if no case starting with prefix would pass the filter
+        """
+        return self.case_filter is None or self.case_filter in prefix or prefix in self.case_filter
+
+
+def _create_map_object(map_path):
+    return GameObject(components.Transform(), components.TiledMap(map_path=map_path))
+
+
+def _random_air_positions(tiled_map, count, rng, area=None):
+    """
+    Finds positions on the map which are not inside collidable tiles
+    """
+    tile_map = tiled_map.map
+    if area is None:
+        area = Rect(0, 0, tile_map.width * tile_map.tilewidth, tile_map.height * tile_map.tileheight)
+
+    positions = []
+    while len(positions) < count:
+        position = Vector2(rng.uniform(area.left + 50, area.right - 50), rng.uniform(area.top + 50, area.bottom - 50))
+        if len(tiled_map.get_tiles_for_area(Rect(position.x - 25, position.y - 50, 50, 100), collidable=True)) == 0:
+            positions.append(position)
+    return positions
+
+
+def _create_character(position, spritesheet):
+    sprite_renderer = components.SpriteRenderer(image=spritesheet.subsurface(Rect(67, 196, 66, 92)),
+                                                animation_data=PLAYER_ANIMATIONS, default_animation="stand")
+    controller = CharacterController()
+    controller.velocity.x = 100
+    return GameObject(components.Transform(position=position), sprite_renderer,
+                      components.StaticBoundingRectangle(46, 90), components.Collider(), controller)
+
+
+def _create_scene_with_characters(map_path, count, rng, area=None):
+    scene = Scene(None)
+    map_object = _create_map_object(map_path)
+    scene.add_object(map_object)
+    scene.setup_frame(1.0 / 60)
+    tiled_map = map_object.get_component(components.TiledMap)
+
+    spritesheet = pygame.image.load(PLAYER_SPRITESHEET)
+    scene.add_objects([_create_character(x, spritesheet) for x in _random_air_positions(tiled_map, count, rng, area)])
+    scene.setup_frame(1.0 / 60)
+    return scene, tiled_map
+
+
+def bench_collisions(benchmark, counts, rng):
+    for count in counts:
+        scene = Scene(None)
+        # Keep density constant so that the number of actual collisions grows linearly
+        side = int((count * 200 * 200) ** 0.5)
+        scene.add_objects([GameObject(components.Transform(position=Vector2(rng.uniform(0, side), rng.uniform(0, side))),
+                                      components.StaticBoundingRectangle(40, 40), components.Collider())
+                           for x in range(0, count)])
+        scene.setup_frame(1.0 / 60)
+        benchmark.run("collisions/n={0}".format(count), scene._check_collisions)
+
+
+def bench_tile_queries(benchmark, counts, map_paths, rng):
+    tiled_map = _create_map_object(map_paths[DEFAULT_MAP_SCALE]).get_component(components.TiledMap)
+    tile_map = tiled_map.map
+    for count in counts:
+        areas = [Rect(rng.uniform(0, tile_map.width * tile_map.tilewidth - 50),
+                      rng.uniform(0, tile_map.height * tile_map.tileheight - 100), 46, 90)
+                 for x in range(0, count)]
+
+        def query():
+            for area in areas:
+                tiled_map.get_tiles_for_area(area, collidable=True)
+
+        benchmark.run("get_tiles_for_area/n={0}".format(count), query, count)
+
+
+def bench_character_controllers(benchmark, counts, map_paths, rng):
+    for count in counts:
+        scene, _ = _create_scene_with_characters(map_paths[DEFAULT_MAP_SCALE], count, rng)
+        controllers = scene.get_objects_of_type(CharacterController)
+        positions = [Vector2(x.transform.position) for x in controllers]
+
+        def update():
+            # Every run starts from the same state, otherwise characters would eventually leave the map
+            for controller, position in zip(controllers, positions):
+                controller.transform.position = position
+                controller.velocity = Vector2(100, 0)
+                controller.flying = True
+                controller.update()
+
+        benchmark.run("character_controller_update/n={0}".format(count), update)
+
+
+def bench_render(benchmark, counts, map_paths, rng):
+    for count in counts:
+        camera_area = Rect(0, 0, SCREEN_SIZE[0] * 2, SCREEN_SIZE[1] * 2)
+        scene, tiled_map = _create_scene_with_characters(map_paths[DEFAULT_MAP_SCALE], count, rng, camera_area)
+        scene.camera = GameObject(components.Transform(position=Vector2(camera_area.center)), components.Camera())
+        scene.add_object(scene.camera)
+        scene.setup_frame(1.0 / 60)
+
+        renderer = Renderer(pygame.Surface(SCREEN_SIZE))
+        benchmark.run("render/n={0}".format(count), lambda: renderer.render(scene))
+
+
+def bench_offscreen_render(benchmark, counts, map_paths, rng):
+    """
+    Renders a scene whose sprites are spread over the whole map, frame time should depend on visible sprites only
+    """
+    spritesheet = pygame.image.load(PLAYER_SPRITESHEET)
+    image = spritesheet.subsurface(Rect(67, 196, 66, 92))
+    for count in counts:
+        scene = Scene(None)
+        map_object = _create_map_object(map_paths[DEFAULT_MAP_SCALE])
+        scene.add_object(map_object)
+        tile_map = map_object.get_component(components.TiledMap).map
+        width = tile_map.width * tile_map.tilewidth
+        height = tile_map.height * tile_map.tileheight
+        scene.add_objects([GameObject(components.Transform(position=Vector2(rng.uniform(0, width),
+                                                                            rng.uniform(0, height))),
+                                      components.SpriteRenderer(image=image))
+                           for x in range(0, count * 10)])
+        scene.camera = GameObject(components.Transform(position=Vector2(width / 2, height / 2)), components.Camera())
+        scene.add_object(scene.camera)
+        scene.setup_frame(1.0 / 60)
+
+        renderer = Renderer(pygame.Surface(SCREEN_SIZE))
+        benchmark.run("render_offscreen/n={0}".format(count * 10), lambda: renderer.render(scene))
+
+
+def bench_scaled_render(benchmark, counts, map_paths, rng):
+    """
+    Renders at reduced resolutions, upscale cost is included
+    """
+    count = counts[-1]
+    camera_area = Rect(0, 0, SCREEN_SIZE[0] * 2, SCREEN_SIZE[1] * 2)
+    scene, tiled_map = _create_scene_with_characters(map_paths[DEFAULT_MAP_SCALE], count, rng, camera_area)
+    scene.camera = GameObject(components.Transform(position=Vector2(camera_area.center)), components.Camera())
+    scene.add_object(scene.camera)
+    scene.setup_frame(1.0 / 60)
+
+    for upscale in [Renderer.UPSCALE_SMOOTH, Renderer.UPSCALE_INTEGER]:
+        measured = set()
+        for scale in RENDER_SCALES:
+            renderer = Renderer(pygame.Surface(SCREEN_SIZE), render_scale=scale, upscale=upscale)
+            # Integer upscaling rounds some of the scales to the same one
+            if renderer.render_scale in measured:
+                continue
+            measured.add(renderer.render_scale)
+            benchmark.run("render_scaled/upscale={0}/scale={1}/n={2}".format(upscale, renderer.render_scale, count),
+                          lambda: renderer.render(scene))
+
+
+def bench_tile_render(benchmark, sizes, directory):
+    """
+    Renders an empty map with each tile mode. Frame time of culled and chunked modes should not depend on map size
+    """
+    modes = [Renderer.TILES_CULLED, Renderer.TILES_CHUNKED, Renderer.TILES_ALL]
+    for size in sizes:
+        names = dict((x, "render_tiles/mode={0}/tiles={1}x{1}".format(x, size)) for x in modes)
+        if not any(benchmark.wants(x) for x in names.values()):
+            continue
+
+        path = write_sized_level(size, size, os.path.join(directory, "level01_{0}x{0}.tmx".format(size)))
+        scene = Scene(None)
+        map_object = _create_map_object(path)
+        scene.add_object(map_object)
+        tile_map = map_object.get_component(components.TiledMap).map
+        scene.camera = GameObject(components.Transform(position=Vector2(tile_map.width * tile_map.tilewidth / 2,
+                                                                        tile_map.height * tile_map.tileheight / 2)),
+                                  components.Camera())
+        scene.add_object(scene.camera)
+        scene.setup_frame(1.0 / 60)
+
+        for mode in modes:
+            if mode == Renderer.TILES_ALL and size > ALL_TILES_MAX_SIZE:
+                continue
+            renderer = Renderer(pygame.Surface(SCREEN_SIZE), tile_mode=mode)
+            benchmark.run(names[mode], lambda: renderer.render(scene))
+        os.remove(path)
+
+
+def bench_map_loading(benchmark, scales, map_paths):
+    for scale in scales:
+        benchmark.run("map_load/scale={0}".format(scale), lambda: tiledmap.load(map_paths[scale]))
+
+
+def run(quick=False, case_filter=None, min_time=0.5, report=print):
+    """
+    Runs all benchmarks, requires pygame's display which will be initialized headless
+
+    :param bool quick: Uses fewer and smaller cases
+    :param str case_filter: If set, only cases containing the string are run
+    :param float min_time: Minimum time spent timing every case
+    :param report: Callable receiving progress lines
+    :return: Dictionary with results and information about the environment
+    """
+    counts = QUICK_OBJECT_COUNTS if quick else OBJECT_COUNTS
+    scales = QUICK_MAP_SCALES if quick else MAP_SCALES
+    tile_map_sizes = QUICK_TILE_MAP_SIZES if quick else TILE_MAP_SIZES
+
+    Application().init(1, 1, headless=True)
+    benchmark = Benchmark(min_time=min_time, case_filter=case_filter, report=report)
+    rng = random.Random(0)
+
+    directory = tempfile.mkdtemp(prefix="benchmarks")
+    map_paths = dict((x, write_scaled_level(x, directory)) for x in set(scales) | {DEFAULT_MAP_SCALE})
+
+    if benchmark.wants("collisions"):
+        bench_collisions(benchmark, counts, rng)
+    if benchmark.wants("get_tiles_for_area"):
+        bench_tile_queries(benchmark, counts, map_paths, rng)
+    if benchmark.wants("character_controller_update"):
+        bench_character_controllers(benchmark, counts, map_paths, rng)
+    if benchmark.wants("render"):
+        bench_render(benchmark, counts, map_paths, rng)
+    if benchmark.wants("render_offscreen"):
+        bench_offscreen_render(benchmark, counts, map_paths, rng)
+    if benchmark.wants("render_scaled"):
+        bench_scaled_render(benchmark, counts, map_paths, rng)
+    if benchmark.wants("render_tiles"):
+        bench_tile_render(benchmark, tile_map_sizes, directory)
+    if benchmark.wants("map_load"):
+        bench_map_loading(benchmark, scales, map_paths)
+
+    for path in map_paths.values():
+        os.remove(path)
+    os.rmdir(directory)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "quick": quick,
+        },
+        "results": benchmark.results,
+    }
+
+
+def compare(results, baseline, threshold, report=print):
+    """
+    Compares results to a baseline using median timings
+
+    :param dict results: Results as returned by run
+    :param dict baseline: Results loaded from a previous run
+    :param float threshold: Relative slowdown above which a case is considered a regression, e.g. 0.2 for 20%
+    :param report: Callable receiving report lines
+    :return: List of names of regressed cases
+    """
+    regressions = []
+    for name, result in sorted(results["results"].items()):
+        if name not in baseline["results"]:
+            report("{0:<40}{1:>12}".format(name, "new"))
+            continue
+
+        ratio = result["median_ms"] / max(baseline["results"][name]["median_ms"], 1e-9)
+        status = ""
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        report("{0:<40}{1:>11.2f}x {2}".format(name, ratio, status))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine benchmark suite")
+    parser.add_argument("--output", help="Writes JSON results to the file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compares results against a stored JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown reported as a regression when comparing (default: 0.2)")
+    parser.add_argument("--filter", dest="case_filter", help="Runs only cases containing the string")
+    parser.add_argument("--quick", action="store_true", help="Runs fewer and smaller cases")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds spent timing every case")
+    args = parser.parse_args()
+
+    # Animation and map properties reference assets relative to the repository
+    os.chdir(ROOT)
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.ERROR)
+
+    results = run(args.quick, args.case_filter, args.min_time)
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        print("")
+        if len(compare(results, baseline, args.threshold)) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
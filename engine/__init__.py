@@ -5,3 +5,4 @@ from .gameobject import GameObject
 from .application import Application
 from .scene import Scene
 from .input import Input
+from .assets import Assets
@@ -1,8 +1,12 @@
 __author__ = 'Maverick'
 import pygame
 from . import renderer
+import os
+import queue
 import sys
+import threading
 from engine.input import Input, KeyStatus
+from engine.timing import FramePacer
 import logging
 
 
@@ -13,22 +17,95 @@ class MissingSceneError(Exception):
     pass
 
 
+class _SimulationWorker(object):
+    """
+    Long-lived thread simulating pipelined frames, fed one frame at a time so that no thread is started per frame
+    """
+    def __init__(self, simulate):
+        """
+        :param simulate: Function simulating a frame, called on the worker thread with arguments passed to submit
+        """
+        self._simulate = simulate
+        self._frames = queue.Queue()
+        self._results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="simulation")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, *args):
+        """
+        Starts simulating a frame, wait() has to be called before the next one is submitted
+        """
+        self._frames.put(args)
+
+    def wait(self):
+        """
+        Waits until the submitted frame is simulated
+
+        :return: Exception raised by the simulation, None if it succeeded
+        """
+        return self._results.get()
+
+    def stop(self):
+        self._frames.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            args = self._frames.get()
+            if args is None:
+                return
+
+            try:
+                self._simulate(*args)
+                error = None
+            except BaseException as e:
+                # Raised again on the main thread, which would otherwise never learn about it
+                error = e
+            self._results.put(error)
+
+
 class Application(object):
     """
     :type renderer: engine.renderer.Renderer
     :type scene: engine.scene.Scene
+    :type fixed_timestep: engine.timing.FixedTimestep
+    :type profiler: engine.profiler.Profiler
+    :type report_interval: float
+    :type pipelined: bool
+    :type frame_pacer: engine.timing.FramePacer
     """
+    INPUT_EVENTS = [pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION]
+
     def __init__(self):
         self.scene = None
         self.renderer = None
+        # If set, the scene is simulated in fixed ticks and rendering interpolates between them
+        self.fixed_timestep = None
+        # If set, frame phases and component callbacks are timed and summarized in the log every report_interval
+        self.profiler = None
+        self.report_interval = 5
+        # Caps the frame rate if its max_fps is set and keeps the histogram of real frame times reported in the log
+        self.frame_pacer = FramePacer()
+        # If set, the next frame is simulated on a worker thread while the previous one is drawn from its snapshot.
+        # Components must not change tiles of maps or draw onto sprite images during simulation while pipelined,
+        # surfaces of interface elements are copied into the snapshot and can be redrawn
+        self.pipelined = False
+        # Pipelined frames are captured between preframe and postframe, postframe then runs with the next frame
+        self._postframe_pending = False
+        # Started when the first pipelined frame is run
+        self._simulation_worker = None
 
-    def init(self, width, height):
+    def init(self, width, height, headless=False):
         """
         Initializes the game, runs pygame.init()
 
         :param int width: width of the game window
         :param int height: height of the game window
+        :param bool headless: If True, no window is opened and everything is rendered to an offscreen display
         """
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
         self.renderer = renderer.Renderer(pygame.display.set_mode((width,height)))
 
@@ -36,8 +113,6 @@ class Application(object):
         """
         Runs one frame of the game. init() needs to be run first
         """
-        clock = pygame.time.Clock()
-
         if self.scene is None:
             raise MissingSceneError()
 
@@ -48,27 +123,172 @@ class Application(object):
         logging.basicConfig(format='%(levelname)s:%(message)s', level=level)
 
         fps_report = 0
+        frame_times = self.frame_pacer.histogram
         while True:
-            clock.tick()
-            if len(pygame.event.get(pygame.QUIT)) > 0:
+            frame_time = self.frame_pacer.wait()
+            profiler = self.profiler
+            self.scene.profiler = profiler
+            if profiler is not None:
+                profiler.begin_frame()
+
+            if self._phase("input", self._poll_input):
+                self._stop_simulation_worker()
                 sys.exit()
 
-            dt = 1/clock.get_fps() if clock.get_fps() != 0 else 0.04
+            # Simulation steps by the mean of the last few frames, so that a single hitch does not make it jump
+            dt = frame_times.mean(10) if len(frame_times) > 0 else 0.04
 
-            fps_report += dt
-            if fps_report >= 5:
+            fps_report += frame_time
+            if fps_report >= self.report_interval:
                 fps_report = 0
-                logging.info("FPS: {fps}".format(fps=1.0/dt))
+                logging.info(frame_times.summary())
+                if profiler is not None:
+                    logging.info(profiler.summary())
+                    stats = self.renderer.stats()
+                    logging.info("Draw calls: {0} issued, {1} culled".format(stats["draw_calls"], stats["culled"]))
 
-            self._handle_input(pygame.event.get([pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN,
-                                                 pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION]))
+            if self.pipelined:
+                self._run_pipelined_frame(dt, frame_time)
+            else:
+                if self.fixed_timestep is None:
+                    self._run_frame(dt)
+                else:
+                    self._run_fixed_frame(frame_time)
+                self._phase("flip", self.renderer.present)
+            if profiler is not None:
+                profiler.end_frame()
+
+    def run_headless(self, dt, frames=None, stop_condition=None, render=False):
+        """
+        Simulates the scene as fast as possible using a constant time step, without waiting for real time to pass.
+        Meant for automated playtests and benchmarks, returns instead of exiting. Input events posted to pygame's
+        queue are still handled if the display has been initialized
+
+        :param float dt: Simulated time (in seconds) per frame
+        :param int frames: Number of frames to simulate, None for no limit
+        :param stop_condition: Callable taking the application, simulation stops after a frame for which it
+                               returns True
+        :param bool render: If True every frame is rendered, rendering is skipped otherwise
+        :return int: Number of simulated frames
+        """
+        if self.scene is None:
+            raise MissingSceneError()
 
-            self.scene.setup_frame(dt)
-            self.scene.simulate_preframe()
-            self.renderer.render(self.scene)
-            self.scene.simulate_postframe()
+        if frames is None and stop_condition is None:
+            raise ValueError("Headless run needs a frame count or a stop condition")
+
+        frame = 0
+        while frames is None or frame < frames:
+            profiler = self.profiler
+            self.scene.profiler = profiler
+            if profiler is not None:
+                profiler.begin_frame()
+
+            if pygame.display.get_init() and self._phase("input", self._poll_input):
+                break
+
+            self._run_frame(dt, render)
+            frame += 1
+            if profiler is not None:
+                profiler.end_frame()
+
+            if stop_condition is not None and stop_condition(self):
+                break
+
+        return frame
+
+    def _run_frame(self, dt, render=True):
+        self._finish_postframe()
+        self._phase("setup_frame", self.scene.setup_frame, dt)
+        self._phase("simulate_preframe", self.scene.simulate_preframe)
+        if render:
+            self._phase("render", self.renderer.render, self.scene)
+        self._phase("simulate_postframe", self.scene.simulate_postframe)
+
+    def _run_fixed_frame(self, frame_time):
+        self._run_ticks(frame_time)
+        self._phase("render", self.renderer.render, self.scene, self.fixed_timestep.alpha)
+
+    def _run_ticks(self, frame_time):
+        # Every tick is simulated fully, including postframe, before the interpolated state gets rendered
+        self._finish_postframe()
+        timestep = self.fixed_timestep
+        for tick in range(0, timestep.advance(frame_time)):
+            self.scene.store_previous_transforms()
+            self._phase("setup_frame", self.scene.setup_frame, timestep.dt)
+            self._phase("simulate_preframe", self.scene.simulate_preframe)
+            self._phase("simulate_postframe", self.scene.simulate_postframe)
+
+    def _run_pipelined_frame(self, dt, frame_time):
+        """
+        Draws the state simulated during the previous frame while the next frame is simulated on a worker thread.
+        Display stays on the main thread, the worker only touches the scene
+        """
+        alpha = self.fixed_timestep.alpha if self.fixed_timestep is not None else 1.0
+        snapshot = self._phase("capture", self.renderer.capture, self.scene, alpha)
+
+        if self._simulation_worker is None:
+            self._simulation_worker = _SimulationWorker(self._simulate_pipelined)
+        worker = self._simulation_worker
+        worker.submit(dt, frame_time)
+        try:
+            self._phase("render", self.renderer.draw, snapshot)
+            self._phase("flip", self.renderer.present)
+        finally:
+            error = worker.wait()
+
+        if error is not None:
+            raise error
+
+    def _simulate_pipelined(self, dt, frame_time):
+        try:
+            if self.fixed_timestep is not None:
+                self._run_ticks(frame_time)
+                return
+
+            self._finish_postframe()
+            self._phase("setup_frame", self.scene.setup_frame, dt)
+            self._phase("simulate_preframe", self.scene.simulate_preframe)
+            self._postframe_pending = True
+        except BaseException:
+            # Postframe must not run for a frame whose preframe did not finish
+            self._postframe_pending = False
+            raise
+
+    def _stop_simulation_worker(self):
+        if self._simulation_worker is not None:
+            self._simulation_worker.stop()
+            self._simulation_worker = None
+
+    def _finish_postframe(self):
+        if self._postframe_pending:
+            self._postframe_pending = False
+            self._phase("simulate_postframe", self.scene.simulate_postframe)
+
+    def _phase(self, name, function, *args):
+        """
+        Runs the function, timing it as the named phase if profiling is enabled
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return function(*args)
+
+        start = profiler.clock()
+        result = function(*args)
+        profiler.record_phase(name, profiler.clock() - start)
+        return result
+
+    def _poll_input(self):
+        """
+        Handles pending input events
+
+        :return: True if the application has been asked to quit
+        """
+        if len(pygame.event.get(pygame.QUIT)) > 0:
+            return True
 
-            pygame.display.flip()
+        self._handle_input(pygame.event.get(self.INPUT_EVENTS))
+        return False
 
     def _handle_input(self, events):
         key_status = Input.key_status
@@ -0,0 +1,135 @@
+import os
+import weakref
+import pygame
+
+
+class Assets(object):
+    """
+    Engine-wide image cache. Every file is loaded once and shared by everyone requesting it, images are converted
+    to the display's pixel format as soon as a display exists, which makes blitting them considerably faster.
+
+    Cache only holds weak references, an image is evicted once nothing else uses it. Shared images must not be drawn
+    onto, copy them first if they need to be modified
+    """
+    _images = {}
+    # Source surface to dictionary of flip flags to flipped surface
+    _flipped = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def load_image(cls, path):
+        """
+        Returns the image at path, loading it only if it is not already in use
+
+        :param str path: Path to the image
+        :rtype: pygame.Surface
+        """
+        key = os.path.normcase(os.path.abspath(path))
+        reference = cls._images.get(key)
+        surface = reference() if reference is not None else None
+        if surface is not None and (reference.converted or pygame.display.get_surface() is None):
+            return surface
+
+        if surface is None:
+            surface = pygame.image.load(path)
+        converted = pygame.display.get_surface() is not None
+        if converted:
+            # Images loaded before the display was created are converted on their next request
+            if surface.get_flags() & pygame.SRCALPHA or surface.get_alpha() is not None:
+                surface = surface.convert_alpha()
+            else:
+                surface = surface.convert()
+
+        cls._images[key] = _ImageReference(surface, key, converted)
+        return surface
+
+    @classmethod
+    def get_flipped(cls, surface, horizontal_flip, vertical_flip):
+        """
+        Returns a flipped copy of the surface, created only once per surface and shared by everyone flipping it.
+        Copies are dropped together with their source
+
+        :param pygame.Surface surface: Source surface
+        :param bool horizontal_flip: Flips horizontally if True
+        :param bool vertical_flip: Flips vertically if True
+        :rtype: pygame.Surface
+        """
+        if not horizontal_flip and not vertical_flip:
+            return surface
+
+        variants = cls._flipped.get(surface)
+        if variants is None:
+            variants = cls._flipped[surface] = {}
+        key = (bool(horizontal_flip), bool(vertical_flip))
+        flipped = variants.get(key)
+        if flipped is None:
+            flipped = variants[key] = pygame.transform.flip(surface, key[0], key[1])
+        return flipped
+
+    @classmethod
+    def is_loaded(cls, path):
+        """
+        :param str path: Path to the image
+        :return: True if the image is loaded and in use
+        """
+        reference = cls._images.get(os.path.normcase(os.path.abspath(path)))
+        return reference is not None and reference() is not None
+
+    @classmethod
+    def memory_report(cls):
+        """
+        Lists all loaded images, largest first
+
+        :return: List of dictionaries with path, size, converted flag and bytes used by pixels of every image
+        """
+        report = []
+        for key, reference in list(cls._images.items()):
+            surface = reference()
+            if surface is None:
+                continue
+            report.append({
+                "path": key,
+                "size": surface.get_size(),
+                "converted": reference.converted,
+                "bytes": surface.get_pitch() * surface.get_height(),
+            })
+        report.sort(key=lambda x: x["bytes"], reverse=True)
+        return report
+
+    @classmethod
+    def memory_usage(cls):
+        """
+        :return: Total bytes used by pixels of all loaded images
+        """
+        return sum(x["bytes"] for x in cls.memory_report())
+
+    @classmethod
+    def clear(cls):
+        """
+        Forgets all images, images still in use stay valid but will not be shared with later requests
+        """
+        cls._images.clear()
+        cls._flipped.clear()
+
+    @classmethod
+    def _evict(cls, key, reference):
+        if cls._images.get(key) is reference:
+            del cls._images[key]
+
+
+class _ImageReference(weakref.ref):
+    """
+    Weak reference to a cached image which removes its cache entry once the image is no longer used
+    """
+    __slots__ = ["key", "converted"]
+
+    def __new__(cls, surface, key, converted):
+        return super(_ImageReference, cls).__new__(cls, surface, _evict_image)
+
+    def __init__(self, surface, key, converted):
+        super(_ImageReference, self).__init__(surface, _evict_image)
+        self.key = key
+        self.converted = converted
+
+
+def _evict_image(reference):
+    Assets._evict(reference.key, reference)
@@ -0,0 +1,61 @@
+from itertools import combinations
+from .spatial import SpatialHash
+
+
+class Broadphase(object):
+    """
+    Base class for collision broadphases. A broadphase narrows down all colliders in the scene to pairs which might
+    be colliding, only those pairs are then precisely tested by the scene
+    """
+    def find_pairs(self, colliders):
+        """
+        Finds candidate pairs among the colliders
+
+        :param list colliders: Colliders to test, in scene order
+        :return: Iterable of (collider1, collider2) tuples, collider1 always preceding collider2 in the colliders list.
+                 Pairs are returned in scene order
+        """
+        raise NotImplementedError()
+
+
+class BruteForceBroadphase(Broadphase):
+    """
+    Returns every possible pair, useful for scenes with very few colliders or for debugging other broadphases
+    """
+    def find_pairs(self, colliders):
+        return combinations(colliders, 2)
+
+
+class SpatialHashBroadphase(Broadphase):
+    """
+    Buckets colliders in a uniform grid, only colliders sharing a cell are returned as pairs. Cell size should be
+    somewhat bigger than a typical collider
+
+    :type cell_size: int
+    """
+    def __init__(self, cell_size=128):
+        self._grid = SpatialHash(cell_size)
+
+    @property
+    def cell_size(self):
+        return self._grid.cell_size
+
+    def find_pairs(self, colliders):
+        grid = self._grid
+        order = {}
+        for index, collider in enumerate(colliders):
+            order[collider] = index
+            grid.update(collider, collider.get_collision_shape())
+
+        if len(grid) != len(order):
+            for collider in [x for x in grid if x not in order]:
+                grid.remove(collider)
+
+        pairs = []
+        for collider1, collider2 in grid.pairs():
+            if order[collider1] > order[collider2]:
+                collider1, collider2 = collider2, collider1
+            pairs.append((order[collider1], order[collider2], collider1, collider2))
+
+        pairs.sort(key=lambda x: (x[0], x[1]))
+        return [(x[2], x[3]) for x in pairs]
@@ -3,11 +3,25 @@ import pygame
 from engine.math import Vector2, Rect
 from collections import namedtuple
 from . import tiledmap
+from .assets import Assets
 import logging
 import sys
 import ast
 import json
+import os
 import re
+import numpy
+import weakref
+from types import MappingProxyType
+
+
+def _notify_moved(component):
+    """
+    Tells the scene of component's object that its renderable bounds might have changed
+    """
+    obj = component.game_object
+    if obj is not None and obj.scene is not None:
+        obj.scene._on_object_moved(obj)
 
 
 class BaseComponent(object):
@@ -103,11 +117,15 @@ class Camera(BaseComponent):
 
 class Renderable(BaseComponent):
     """
+    Renderables are drawn in order of their layer, ones on the same layer in order of their objects in the scene
+
     :type should_render: bool
+    :type layer: int
     """
     def __init__(self):
         super(Renderable, self).__init__()
         self.should_render = True
+        self.layer = 0
 
 
 class SpriteRenderer(Renderable):
@@ -139,12 +157,144 @@ class SpriteRenderer(Renderable):
             """
             pass
 
+    class SheetFrames(object):
+        """
+        Frames of an animation set sliced out of one spritesheet, shared by all renderers playing them. Kept alive
+        only by the renderers, frames and the sheet are released together with the last one
+
+        :type spritesheet: pygame.Surface
+        """
+        def __init__(self, animation_set, spritesheet):
+            """
+            :param SpriteRenderer.AnimationSet animation_set: Animations the frames are sliced for
+            :param pygame.Surface spritesheet: Spritesheet the frames are on
+            """
+            self.animation_set = animation_set
+            self.spritesheet = spritesheet
+            self._frames = {}
+
+        def get_frames(self, animation_name, horizontal_flip=False, vertical_flip=False):
+            """
+            Returns frames of an animation cut out of the spritesheet, flipped variants of all frames are created
+            together the first time they are requested
+
+            :param str animation_name: Name of the animation
+            :param bool horizontal_flip: Returns horizontally flipped frames if True
+            :param bool vertical_flip: Returns vertically flipped frames if True
+            :return: Tuple of surfaces
+            """
+            key = (animation_name, bool(horizontal_flip), bool(vertical_flip))
+            frames = self._frames.get(key)
+            if frames is None:
+                if horizontal_flip or vertical_flip:
+                    frames = tuple(Assets.get_flipped(x, horizontal_flip, vertical_flip)
+                                   for x in self.get_frames(animation_name))
+                else:
+                    frames = tuple(self.spritesheet.subsurface(x)
+                                   for x in self.animation_set.animations[animation_name].frames)
+                self._frames[key] = frames
+            return frames
+
+    class AnimationSet(object):
+        """
+        Parsed animation data, shared read-only by all renderers using the same data. Loaded sets and frames sliced
+        out of spritesheets are only cached while a renderer uses them
+
+        :type name: str
+        :type animations: types.MappingProxyType
+        """
+        _loaded = weakref.WeakValueDictionary()
+
+        def __init__(self, name, animations):
+            """
+            :param str name: Name of the animation set
+            :param dict animations: Animation name to SpriteRenderer._Animation, with frames as x/y/width/height tuples
+            """
+            self.name = name
+            self.animations = MappingProxyType(animations)
+            self._sheets = weakref.WeakValueDictionary()
+
+        @classmethod
+        def load(cls, path):
+            """
+            Returns animations from a json file, each file is parsed only once
+
+            :param str path: Path to the json file
+            :return: Animation set, None if the file could not be read or parsed
+            """
+            key = os.path.normcase(os.path.abspath(path))
+            animation_set = cls._loaded.get(key)
+            if animation_set is None:
+                try:
+                    with open(path, 'r') as animation_file:
+                        animation_data = json.load(animation_file)
+                except IOError:
+                    logging.warning("Could not open {path}".format(path=path))
+                    return None
+                except ValueError:
+                    logging.warning("Could not parse {path}".format(path=path))
+                    return None
+
+                animation_set = cls.parse(animation_data)
+                if animation_set is not None:
+                    cls._loaded[key] = animation_set
+            return animation_set
+
+        @classmethod
+        def parse(cls, animation_data):
+            """
+            :param dict animation_data: Loaded animation data
+            :return: Animation set, None if the data is faulty
+            """
+            try:
+                animations = {}
+                for key, value in animation_data.items():
+                    if key != "name":
+                        frames = []
+                        for frame in value.get("frames", []):
+                            coords = frame.split(" ")
+                            frames.append((int(coords[0]), int(coords[1]), int(coords[2]), int(coords[3])))
+                        animations[key] = SpriteRenderer._Animation(name=key, speed=value.get("speed", 0),
+                                                                    frames=tuple(frames))
+                return cls(animation_data["name"], animations)
+            except IndexError as e:
+                logging.warning("Could not get animation data index")
+            except ValueError as e:
+                logging.warning("Faulty animation data: {error}".format(error=e))
+            return None
+
+        def get_sheet_frames(self, spritesheet):
+            """
+            Returns the shared frames of the spritesheet, has to be referenced for as long as the frames are used
+
+            :param pygame.Surface spritesheet: Spritesheet the frames are on
+            :rtype: SpriteRenderer.SheetFrames
+            """
+            sheet_frames = self._sheets.get(spritesheet)
+            if sheet_frames is None:
+                sheet_frames = self._sheets[spritesheet] = SpriteRenderer.SheetFrames(self, spritesheet)
+            return sheet_frames
+
+        def get_frames(self, spritesheet, animation_name, horizontal_flip=False, vertical_flip=False):
+            """
+            Returns frames of an animation cut out of the spritesheet, see SheetFrames.get_frames
+
+            :param pygame.Surface spritesheet: Spritesheet the frames are on
+            :param str animation_name: Name of the animation
+            :param bool horizontal_flip: Returns horizontally flipped frames if True
+            :param bool vertical_flip: Returns vertically flipped frames if True
+            :return: Tuple of surfaces
+            """
+            return self.get_sheet_frames(spritesheet).get_frames(animation_name, horizontal_flip, vertical_flip)
+
     """
     :type image: pygame.Surface
     :type horizontal_flip: bool
     :type vertical_flip: bool
+    :type animations: types.MappingProxyType
     """
     _Animation = namedtuple("_Animation", ["name", "speed", "frames"])
+    NO_ANIMATIONS = MappingProxyType({})
 
     def __init__(self, image=None, horizontal_flip=False, vertical_flip=False, animation_data=None,
                  default_animation=None):
@@ -152,8 +302,10 @@ class SpriteRenderer(Renderable):
         if animation_data is None and default_animation is not None:
             raise ValueError
 
+        self._image = None
+        self._sheet_frames = None
         if isinstance(image, str):
-            self.image = pygame.image.load(image)
+            self.image = Assets.load_image(image)
         else:
             self.image = image
 
@@ -161,9 +313,11 @@ class SpriteRenderer(Renderable):
         self.vertical_flip = vertical_flip
 
         self.animation_set_name = None
-        self.animations = {}
+        self.animations = self.NO_ANIMATIONS
+        self._animation_set = None
 
         self.playing_animation = None
+        self._playing_frames = None
         self.frame_index = None
         self.frame_time = 0.0
         self.animation_looping = False
@@ -176,6 +330,40 @@ class SpriteRenderer(Renderable):
         self.effects = {}
         self._effects_max_id = 0
 
+    @property
+    def image(self):
+        """
+        :rtype: pygame.Surface
+        """
+        return self._image
+
+    @image.setter
+    def image(self, value):
+        old = self._image
+        self._image = value
+        sheet_frames = self._sheet_frames
+        if sheet_frames is not None and (value is None or value.get_parent() is not sheet_frames.spritesheet):
+            # Frames are looked up again for the new image's spritesheet when needed
+            self._sheet_frames = None
+        if old is None or value is None or old.get_size() != value.get_size():
+            _notify_moved(self)
+
+    def get_render_image(self):
+        """
+        Returns the current image with flips applied. Flipped images are created once and shared, flipped frames of
+        a playing animation are all prepared when first needed
+
+        :rtype: pygame.Surface
+        """
+        if self.image is None or (not self.horizontal_flip and not self.vertical_flip):
+            return self.image
+
+        if self.playing_animation is not None and self._playing_frames[self.frame_index] is self.image:
+            frames = self._get_sheet_frames().get_frames(self.playing_animation.name, self.horizontal_flip,
+                                                         self.vertical_flip)
+            return frames[self.frame_index]
+        return Assets.get_flipped(self.image, self.horizontal_flip, self.vertical_flip)
+
     @property
     def playing_animation_name(self):
         """
@@ -187,43 +375,26 @@ class SpriteRenderer(Renderable):
 
     def parse_animations(self, animation_data):
         """
-        Parses the specified file/data to recover all possible animations
+        Parses the specified file/data to recover all possible animations. Files are parsed only once and their
+        animations shared by all renderers
 
         :param str, dict animation_data: Loaded animation data or path to json file
         """
-        if isinstance(animation_data, str):
-            try:
-                animation_data = json.load(open(animation_data, 'r'))
-            except IOError:
-                logging.warning("Could not open {path}".format(path=animation_data))
-                animation_data = None
-            except ValueError:
-                logging.warning("Could not parse {path}".format(path=animation_data))
-                animation_data = None
-
-        if animation_data is not None:
-            try:
-                self.animation_set_name = animation_data["name"]
-                self.animations = {}
-                for key,value in animation_data.items():
-                    if key != "name":
-                        data = self._Animation(name=key, speed=value.get("speed", 0), frames=value.get("frames", []))
-                        if key in self.animations:
-                            raise ValueError
+        if animation_data is None:
+            return
 
-                        for i in range(0, len(data.frames)):
-                            coords = data.frames[i].split(" ")
-                            data.frames[i] = Rect(int(coords[0]), int(coords[1]), int(coords[2]), int(coords[3]))
+        if isinstance(animation_data, str):
+            animation_set = self.AnimationSet.load(animation_data)
+        else:
+            animation_set = self.AnimationSet.parse(animation_data)
 
-                        self.animations[key] = data
-            except IndexError as e:
-                logging.warning("Could not get animation data index")
-                self.animation_set_name = None
-                self.animations = {}
-            except ValueError as e:
-                logging.warning("Faulty animation data: {error}".format(error=e.message))
-                self.animation_set_name = None
-                self.animations = {}
+        self._animation_set = animation_set
+        if animation_set is not None:
+            self.animation_set_name = animation_set.name
+            self.animations = animation_set.animations
+        else:
+            self.animation_set_name = None
+            self.animations = self.NO_ANIMATIONS
 
     def play_animation(self, animation_name, loop=False, speed_rate=1.0, restart=False):
         """
@@ -238,7 +409,14 @@ class SpriteRenderer(Renderable):
             return
 
         if animation_name in self.animations:
+            sheet_frames = self._get_sheet_frames()
+            if sheet_frames is None:
+                self.stop_animation()
+                logging.warning("Cannot find parent image for animation update")
+                return
+
             self.playing_animation = self.animations[animation_name]
+            self._playing_frames = sheet_frames.get_frames(animation_name)
             self.frame_index = 0
             self.frame_time = 0.0
             self.animation_looping = loop
@@ -252,6 +430,7 @@ class SpriteRenderer(Renderable):
         Stops any ongoing animation retaining current image as last frame of animation
         """
         self.playing_animation = None
+        self._playing_frames = None
         self.frame_index = 0
         self.frame_time = 0
 
@@ -321,19 +500,28 @@ class SpriteRenderer(Renderable):
                     self._update_animation_image()
 
     def _update_animation_image(self):
-        parent = self.image.get_parent()
-        if parent is not None:
-            self.image = parent.subsurface(self.playing_animation.frames[self.frame_index])
-        else:
-            self.stop_animation()
-            logging.warning("Cannot find parent image for animation update")
+        self.image = self._playing_frames[self.frame_index]
+
+    def _get_sheet_frames(self):
+        """
+        :return: Frames of the current image's spritesheet, None if the image is not part of a spritesheet
+        :rtype: SpriteRenderer.SheetFrames
+        """
+        if self._sheet_frames is None and self.image is not None and self.image.get_parent() is not None:
+            self._sheet_frames = self._animation_set.get_sheet_frames(self.image.get_parent())
+        return self._sheet_frames
 
 
 class Transform(BaseComponent):
     """
+    Position has to be assigned for the scene to notice the object moved, changing the vector in place does not update
+    the object's bounds used to find visible renderables
+
     :type position: Vector2
     :type rotation: float
     :type scale: float
+    :type previous_position: Vector2
+    :type previous_rotation: float
     """
     def __init__(self, position=None, rotation=0, scale=1):
         super(Transform, self).__init__()
@@ -343,6 +531,41 @@ class Transform(BaseComponent):
         self.rotation = rotation
         self.scale = scale
 
+        self.previous_position = None
+        self.previous_rotation = None
+
+    def store_previous(self):
+        """
+        Remembers current position and rotation as the previous state used for interpolation
+        """
+        moved = self.previous_position != self._position
+        self.previous_position = Vector2(self._position)
+        self.previous_rotation = self.rotation
+        if moved:
+            _notify_moved(self)
+
+    def interpolated_position(self, alpha):
+        """
+        Returns position between the previous and the current one
+
+        :param float alpha: 0 returns previous position, 1 current one
+        :rtype: Vector2
+        """
+        if alpha >= 1 or self.previous_position is None:
+            return self._position
+        return self.previous_position.lerp(self._position, alpha)
+
+    def interpolated_rotation(self, alpha):
+        """
+        Returns rotation between the previous and the current one
+
+        :param float alpha: 0 returns previous rotation, 1 current one
+        :rtype: float
+        """
+        if alpha >= 1 or self.previous_rotation is None:
+            return self.rotation
+        return self.previous_rotation + (self.rotation - self.previous_rotation) * alpha
+
     @property
     def position(self):
         return self._position
@@ -352,6 +575,7 @@ class Transform(BaseComponent):
         self._position.x = value.x
         self._position.y = value.y
         self._position.epsilon = value.epsilon
+        _notify_moved(self)
 
 
 class BoundingRectangle(BaseComponent):
@@ -410,14 +634,29 @@ class Collider(BaseComponent):
 
 class TiledMap(Renderable):
     """
-    :type map: tiledmap.TiledMap
+    Tile queries use lookup tables built when the map is assigned, invalidate() has to be called after tiles, layer
+    visibility or layer properties of the map are changed
     """
-    Tile = namedtuple("Tile", ['x', 'y', 'properties'])
+    Tile = tiledmap.Tile
 
     def __init__(self, map_path=None):
         super(TiledMap, self).__init__()
+        self._map = None
+        self._tile_grid = None
         self.map = tiledmap.load(map_path) if map_path is not None else None
 
+    @property
+    def map(self):
+        """
+        :rtype: tiledmap.TiledMap
+        """
+        return self._map
+
+    @map.setter
+    def map(self, value):
+        self._map = value
+        self._tile_grid = tiledmap.TileGrid(value) if value is not None else None
+
     def spawn(self):
         self.fill_scene_with_objects()
 
@@ -477,35 +716,93 @@ class TiledMap(Renderable):
         Finds all tiles that fit within the given area
 
         :param Rect area: Rectangle within which we want to grab all tiles
-        :param bool extrapolate: If true it will also return tiles out of map bounds instead of raising an exception
+        :param bool extrapolate: If true it will also return tiles out of map bounds instead of clamping the area
         :param properties: Filter tiles by properties they must possess
         :param properties_values: Filter tiles by properties and their respective values
         :return list: List of all found tiles in right-down format
         """
-        top_left = self.get_tile_for_position(area.topleft)
-
-        if top_left is None:
+        tile_range = self._get_tile_range(area, extrapolate)
+        if tile_range is None:
             return []
 
-        # Bottom and right side should always be excluded
-        bottom_right_vec = Vector2(area.bottomright[0], area.bottomright[1])
-        if int(bottom_right_vec.x) == bottom_right_vec.x:
-            bottom_right_vec.x -= 0.3
-        if int(bottom_right_vec.y) == bottom_right_vec.y:
-            bottom_right_vec.y -= 0.3
+        left, top, right, bottom = tile_range
+        if len(properties) == 0 and len(properties_values) == 0:
+            return [self._get_tile_tuple(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
 
-        bottom_right = self.get_tile_for_position(bottom_right_vec)
+        # Tiles out of map bounds have no properties, so they can never pass a filter
+        right = min(right, self.map.width - 1)
+        bottom = min(bottom, self.map.height - 1)
+        mask = self.tile_grid.area_mask(left, top, right, bottom, properties, properties_values)
+        # Transposed so that matches come out column by column, like the unfiltered result
+        xs, ys = numpy.nonzero(mask.T)
+        return [self._get_tile_tuple(left + int(x), top + int(y)) for x, y in zip(xs, ys)]
+
+    def has_tiles_in_area(self, area, *properties, **properties_values):
+        """
+        Checks if any tile within the area matches the filters, cheaper than get_tiles_for_area as no tiles are
+        created
 
-        ret = []
-        for x in range(top_left[0], bottom_right[0] + 1):
-            for y in range(top_left[1], bottom_right[1] + 1):
-                tile = self._get_tile_tuple(x, y)
-                if all(prop in tile.properties for prop in properties):
-                    if all(key in tile.properties and tile.properties[key] == value
-                                                          for key,value in properties_values.items()):
-                        ret.append(tile)
+        :param Rect area: Rectangle to check
+        :param properties: Properties the tile must possess
+        :param properties_values: Properties and their respective values the tile must have
+        :return bool: True if at least one tile matches
+        """
+        tile_range = self._get_tile_range(area, False)
+        if tile_range is None:
+            return False
 
-        return ret
+        return bool(self.tile_grid.area_mask(*tile_range, properties=properties,
+                                             properties_values=properties_values).any())
+
+    @property
+    def tile_grid(self):
+        """
+        Lookup tables of the current map, rebuilt whenever a map is assigned or the map is invalidated
+
+        :rtype: tiledmap.TileGrid
+        """
+        return self._tile_grid
+
+    def invalidate(self):
+        """
+        Makes tile queries and the game's renderer pick up changes of the map's tiles, layer visibility or layer
+        properties. Has to be called after the map is edited
+        """
+        self.map = self._map
+        scene = self.game_object.scene if self.game_object is not None else None
+        if scene is not None and scene.game is not None and scene.game.renderer is not None:
+            scene.game.renderer.invalidate_tiles(self)
+
+    def _get_tile_range(self, area, extrapolate):
+        """
+        :return: Inclusive left, top, right and bottom tile coordinates covered by the area, None if area's top left
+                 corner is out of the map
+        """
+        if not self.is_position_in_map(area.topleft):
+            return None
+
+        origin = self.game_object.transform.position
+        tile_width = self.map.tilewidth
+        tile_height = self.map.tileheight
+        left = int((area.left - origin[0]) // tile_width)
+        top = int((area.top - origin[1]) // tile_height)
+
+        # Bottom and right side should always be excluded
+        right = area.right
+        bottom = area.bottom
+        if int(right) == right:
+            right -= 0.3
+        if int(bottom) == bottom:
+            bottom -= 0.3
+        right = int((right - origin[0]) // tile_width)
+        bottom = int((bottom - origin[1]) // tile_height)
+
+        if not extrapolate:
+            left = min(left, self.map.width - 1)
+            top = min(top, self.map.height - 1)
+            right = min(right, self.map.width - 1)
+            bottom = min(bottom, self.map.height - 1)
+        return left, top, right, bottom
 
     def get_rectangle_for_tile(self, tile):
         """
@@ -530,6 +827,7 @@ class TiledMap(Renderable):
 
         tiled_map = self.map
         scene = self.game_object.scene
+        objects = []
         for group in tiled_map.visible_object_groups:
             for obj in tiled_map.layers[group]:
                 game_object = GameObject()
@@ -548,30 +846,12 @@ class TiledMap(Renderable):
                 if "components" in obj.properties:
                     self._resolve_components(obj.properties["components"].split(";"), game_object)
 
-                scene.add_object(game_object)
-
-    def _get_tile_tuple(self, x, y):
-        properties = dict()
-        for layer in self.map.visible_tile_layers:
-            layer_properties = None
-            try:
-                if self.map.get_tile_gid(x, y, layer) != 0:
-                    layer_properties = self.map.layers[layer].properties
-            except ValueError:
-                continue
+                objects.append(game_object)
 
-            if layer_properties is None:
-                continue
+        scene.add_objects(objects)
 
-            for key,value in layer_properties.items():
-                try:
-                    if value in ["true", "false"]:
-                        value = value.title()
-                    properties[key] = ast.literal_eval(value)
-                except (SyntaxError, ValueError) as e:
-                    properties[key] = value
-
-        return self.Tile(x=x, y=y, properties=properties)
+    def _get_tile_tuple(self, x, y):
+        return self.tile_grid.get_tile(x, y)
 
     def _resolve_components(self, components, game_object):
         import game.components as game_components
@@ -6,10 +6,13 @@ class GameObject(object):
         self.components = []
         self.scene = None
         self.id = None
-        self.name = None
+        self._name = None
         self.started = False
         self.marked_for_deletion = False
 
+        self._component_cache = {}
+        self._transform = None
+
         self.add_components(*components)
 
     def __eq__(self, other):
@@ -18,6 +21,20 @@ class GameObject(object):
     def __hash__(self):
         return hash(self.id) * hash(self.name)
 
+    @property
+    def name(self):
+        """
+        :rtype: str
+        """
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        old_name = self._name
+        self._name = value
+        if self.scene is not None and old_name != value:
+            self.scene._on_object_renamed(self, old_name)
+
     def destroy(self):
         """
         Marks object for deletion and calls the components' destroy() method
@@ -34,9 +51,13 @@ class GameObject(object):
         :param component: Component list to add
         """
         self.components.extend([ x for x in components if x not in self.components])
+        self._invalidate_component_cache()
         for component in components:
             component.game_object = self
 
+        if self.scene is not None:
+            self.scene._on_components_added(self, components)
+
         for component in components:
             component.on_add()
 
@@ -46,9 +67,13 @@ class GameObject(object):
         """
         removed = [x for x in components if x in self.components]
         self.components = [x for x in self.components if x not in components]
+        self._invalidate_component_cache()
         for component in removed:
             component.game_object = None
 
+        if self.scene is not None:
+            self.scene._on_components_removed(self, removed)
+
     def get_components(self, cls=None):
         """
         Returns all components which inherit from supplied class
@@ -72,8 +97,18 @@ class GameObject(object):
         :param cls: Class of component to return
         :return engine.components.BaseComponent: First component that matches the class, None if none found
         """
-        components = self.get_components(cls)
-        return components[0] if len(components) > 0 else None
+        try:
+            return self._component_cache[cls]
+        except KeyError:
+            pass
+
+        found = None
+        for component in self.components:
+            if isinstance(component, cls):
+                found = component
+                break
+        self._component_cache[cls] = found
+        return found
 
     def has_component(self, cls):
         """
@@ -82,7 +117,7 @@ class GameObject(object):
         :param cls: Class of component to check
         :return boolean: true if object has this component
         """
-        return len(self.get_components(cls)) > 0
+        return self.get_component(cls) is not None
 
     def spawn(self):
         """
@@ -101,15 +136,25 @@ class GameObject(object):
 
     def update(self):
         """
-        Runs object simulation before rendering
+        Runs object simulation before rendering, timing each component if the scene is profiled
         """
+        profiler = self.scene.profiler if self.scene is not None else None
+        if profiler is not None:
+            profiler.run_components(self, "update")
+            return
+
         for component in self.components:
             component.update()
 
     def update_postframe(self):
         """
-        Runs object simulation after rendering
+        Runs object simulation after rendering, timing each component if the scene is profiled
         """
+        profiler = self.scene.profiler if self.scene is not None else None
+        if profiler is not None:
+            profiler.run_components(self, "update_postframe")
+            return
+
         for component in self.components:
             component.update_postframe()
 
@@ -120,4 +165,8 @@ class GameObject(object):
 
         :rtype Transform
         """
-        return self.get_component(Transform)
+        return self._transform
+
+    def _invalidate_component_cache(self):
+        self._component_cache.clear()
+        self._transform = self.get_component(Transform)
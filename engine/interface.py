@@ -1,5 +1,5 @@
-from pygame import image
 from .math import Vector2
+from .assets import Assets
 from collections import OrderedDict
 import pygame
 import pygame.transform
@@ -8,6 +8,10 @@ from functools import reduce
 
 class UIElement(object):
     """
+    Interface is retained: elements keep what they draw between frames and mark themselves and their parents dirty
+    when it changes. Position, width and height changes are tracked only when the attributes are assigned, call
+    mark_dirty after modifying the position vector in place
+
     :type name: str
     :type parent: engine.interface.UIElement
     :type children: OrderedDict
@@ -15,20 +19,58 @@ class UIElement(object):
     :type width: int
     :type height: int
     :type event_listeners: dict
+    :type dirty: bool
     """
     def __init__(self, name, position=None, width=0, height=0):
         self.name = name
         self.parent = None
         self.children = OrderedDict()
+        self.dirty = True
+        self._descendants = None
         if position is  None:
             position = (0, 0)
-        position = Vector2(position[0], position[1])
         self.position = position
         self.width = width
         self.height = height
 
         self.event_listeners = {}
 
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        self._position = Vector2(value[0], value[1])
+        self.mark_dirty()
+
+    @property
+    def width(self):
+        return self._width
+
+    @width.setter
+    def width(self, value):
+        self._width = value
+        self.mark_dirty()
+
+    @property
+    def height(self):
+        return self._height
+
+    @height.setter
+    def height(self, value):
+        self._height = value
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """
+        Marks the element and all its parents as changed since they were last drawn
+        """
+        element = self
+        while element is not None:
+            element.dirty = True
+            element = element.parent
+
     def add_child(self, element):
         """
         Adds a new element as a child, child with the same name cannot already exist. Does not allow addition
@@ -47,6 +89,7 @@ class UIElement(object):
 
         self.children[element.name] = element
         element.parent = self
+        self._invalidate_descendants()
 
     def remove_child(self, element_name):
         """
@@ -63,6 +106,7 @@ class UIElement(object):
 
         element = self.children[element_name]
         del self.children[element_name]
+        self._invalidate_descendants()
         element.parent = None
         return element
 
@@ -103,36 +147,63 @@ class UIElement(object):
 
     def get_children(self, direct=False):
         """
-        Yields all children of this element (unless direct is set to true) in a breadth-first search
+        Returns all children of this element (unless direct is set to true) in breadth-first order. List of all
+        nested children is cached until an element is added or removed anywhere below this one, it must not be
+        modified
 
         :param bool direct: If False, will return all nested children, if True will return only direct
-        :rtype: engine.interface.UIElement
+        :rtype: list
         """
-        children = list(self.children.values())
-        for element in children:
-            if not direct:
-                children.extend(list(element.children.values()))
-            yield element
+        if direct:
+            return list(self.children.values())
+
+        if self._descendants is None:
+            children = list(self.children.values())
+            for element in children:
+                children.extend(element.children.values())
+            self._descendants = children
+        return self._descendants
+
+    def _invalidate_descendants(self):
+        element = self
+        while element is not None:
+            element._descendants = None
+            element.dirty = True
+            element = element.parent
 
 
 class Canvas(UIElement):
     """
     Base UI element which encompasses the entire screen, is responsible for handling all its children for events etc.
-    purposes
+    purposes. If compose is set, children are drawn into a single overlay surface which is redrawn only when
+    some element changed
 
     :type scene: engine.scene.Scene
     :type screen: pygame.Surface
+    :type compose: bool
+    :type overlay: pygame.Surface
     """
-    def __init__(self, scene):
+    def __init__(self, scene, compose=False):
         """
         :param engine.scene.Scene scene: Scene we are being attached to
+        :param bool compose: Composes the interface into a cached overlay surface if True
         """
         if scene is None:
             raise ValueError("Canvas cannot exist without a scene")
         self.scene = scene
         self.screen = scene.game.renderer.screen
+        self.compose = compose
+        self.overlay = None
         super(Canvas, self).__init__("canvas", (0, 0), self.screen.get_width(), self.screen.get_height())
 
+    def clear_dirty(self):
+        """
+        Marks the canvas and all its children as drawn
+        """
+        self.dirty = False
+        for child in self.get_children():
+            child.dirty = False
+
     def update(self):
         for child in self.get_children():
             child.update()
@@ -145,19 +216,53 @@ class Canvas(UIElement):
 
 class SpriteElement(UIElement):
     """
-    Displays specified sprite scaled to width/height
+    Displays specified sprite scaled to width/height. Scaled sprite is cached until the sprite or size changes
 
     :type sprite: pygame.Surface
     """
     def __init__(self, name, sprite_path, position=None, width=0, height=0):
-        self.sprite = None
+        self._sprite = None
+        self._scaled = None
+        sprite = None
         if sprite_path is not None:
-            self.sprite = image.load(sprite_path)
-            if self.sprite is not None:
-                width = self.sprite.get_width() if width == 0 else width
-                height = self.sprite.get_height() if height == 0 else height
+            sprite = Assets.load_image(sprite_path)
+            if sprite is not None:
+                width = sprite.get_width() if width == 0 else width
+                height = sprite.get_height() if height == 0 else height
 
         super(SpriteElement, self).__init__(name, position, width, height)
+        self.sprite = sprite
+
+    @property
+    def sprite(self):
+        return self._sprite
+
+    @sprite.setter
+    def sprite(self, value):
+        self._sprite = value
+        self._scaled = None
+        self.mark_dirty()
+
+    def get_surface(self):
+        """
+        Returns the sprite scaled to element's size
+
+        :return: Surface, None if there is no sprite
+        """
+        sprite = self._sprite
+        if sprite is None:
+            return None
+
+        size = (int(self.width), int(self.height))
+        if self._scaled is None or self._scaled.get_size() != size:
+            if sprite.get_size() == size:
+                self._scaled = sprite
+            else:
+                try:
+                    self._scaled = pygame.transform.smoothscale(sprite, size)
+                except ValueError:
+                    self._scaled = pygame.transform.scale(sprite, size)
+        return self._scaled
 
 
 class SpriteGroup(SpriteElement):
@@ -184,7 +289,7 @@ class SpriteGroup(SpriteElement):
 
         self._images = []
         for sprite in sprites:
-            self._images.append((image.load(sprite[0]), sprite[1], sprite[2]))
+            self._images.append((Assets.load_image(sprite[0]), sprite[1], sprite[2]))
 
         self.rebuild_sprite()
 
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from timeit import default_timer
+import csv
+import json
+
+
+class TimingStat(object):
+    """
+    Accumulated timing of a single measured thing
+
+    :type calls: int
+    :type total: float
+    :type max: float
+    """
+    __slots__ = ["calls", "total", "max"]
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def to_dict(self):
+        """
+        :return: Dictionary with calls count and total, mean and max time in milliseconds
+        """
+        return {
+            "calls": self.calls,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.calls if self.calls > 0 else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Profiler(object):
+    """
+    Collects time spent in every phase of a frame and in component callbacks, grouped by component class.
+    Profiling is enabled by assigning a profiler to Application.profiler (and Scene.profiler for scenes simulated
+    without an application), nothing is measured when they are None.
+
+    Phases recorded by the application: input, setup_frame, simulate_preframe (which includes collisions),
+    collisions, render, simulate_postframe and flip, plus capture in pipelined mode. Pipelined simulation phases
+    overlap render and flip, so phases of a frame can add up to more than the frame itself
+
+    :type frames: int
+    :type phases: collections.OrderedDict
+    :type components: dict
+    """
+    def __init__(self, clock=default_timer):
+        """
+        :param clock: Function returning current time in seconds
+        """
+        self.clock = clock
+        self.frames = 0
+        self.frame = TimingStat()
+        self.phases = OrderedDict()
+        self.components = {}
+        self._frame_start = None
+
+    def reset(self):
+        """
+        Discards everything measured so far
+        """
+        self.frames = 0
+        self.frame = TimingStat()
+        self.phases = OrderedDict()
+        self.components = {}
+        self._frame_start = None
+
+    def begin_frame(self):
+        self._frame_start = self.clock()
+
+    def end_frame(self):
+        if self._frame_start is not None:
+            self.frame.add(self.clock() - self._frame_start)
+            self._frame_start = None
+        self.frames += 1
+
+    def record_phase(self, name, elapsed):
+        """
+        :param str name: Name of the phase
+        :param float elapsed: Time spent in the phase, in seconds
+        """
+        stat = self.phases.get(name)
+        if stat is None:
+            stat = self.phases[name] = TimingStat()
+        stat.add(elapsed)
+
+    def record_component(self, cls, callback, elapsed):
+        """
+        :param type cls: Component class
+        :param str callback: Name of the called method
+        :param float elapsed: Time spent in the call, in seconds
+        """
+        key = (cls, callback)
+        stat = self.components.get(key)
+        if stat is None:
+            stat = self.components[key] = TimingStat()
+        stat.add(elapsed)
+
+    def run_components(self, obj, callback, *args):
+        """
+        Calls the callback on every component of the object, timing each of them
+
+        :param engine.GameObject obj: Object whose components are called
+        :param str callback: Name of the component method, e.g. "update"
+        :param args: Arguments passed to the callback
+        """
+        clock = self.clock
+        for component in obj.components:
+            start = clock()
+            getattr(component, callback)(*args)
+            self.record_component(type(component), callback, clock() - start)
+
+    def phase_stats(self):
+        """
+        :return: Ordered dictionary of phase name to its timings dictionary
+        """
+        return OrderedDict((name, stat.to_dict()) for name, stat in self.phases.items())
+
+    def component_stats(self):
+        """
+        :return: Dictionary of "Class.callback" to timings dictionary
+        """
+        return dict(("{0}.{1}".format(cls.__name__, callback), stat.to_dict())
+                    for (cls, callback), stat in self.components.items())
+
+    def to_dict(self):
+        return {
+            "frames": self.frames,
+            "frame": self.frame.to_dict(),
+            "phases": self.phase_stats(),
+            "components": self.component_stats(),
+        }
+
+    def summary(self, top=5):
+        """
+        Returns a human readable summary: frame rate, mean time per frame spent in each phase and the most
+        expensive component callbacks
+
+        :param int top: How many component callbacks to list
+        :rtype: str
+        """
+        frames = max(self.frames, 1)
+        frame = self.frame.to_dict()
+        fps = 1000.0 / frame["mean_ms"] if frame["mean_ms"] > 0 else 0.0
+        lines = ["Frames: {0}, FPS: {1:.1f}, frame: {2:.3f}ms (max {3:.3f}ms)".format(
+            self.frames, fps, frame["mean_ms"], frame["max_ms"])]
+
+        lines.append("Phases per frame: " + ", ".join("{0} {1:.3f}ms".format(name, stat.total * 1000 / frames)
+                                                     for name, stat in self.phases.items()))
+
+        components = sorted(self.components.items(), key=lambda x: x[1].total, reverse=True)[:top]
+        if len(components) > 0:
+            lines.append("Top components per frame: " + ", ".join(
+                "{0}.{1} {2:.3f}ms ({3} calls)".format(cls.__name__, callback, stat.total * 1000 / frames, stat.calls)
+                for (cls, callback), stat in components))
+        return "\n".join(lines)
+
+    def dump_json(self, path):
+        with open(path, "w") as output:
+            json.dump(self.to_dict(), output, indent=2, sort_keys=True)
+
+    def dump_csv(self, path):
+        """
+        Writes one row per phase and component callback: kind, name, calls, total_ms, mean_ms, max_ms
+        """
+        fields = ["calls", "total_ms", "mean_ms", "max_ms"]
+        with open(path, "w") as output:
+            writer = csv.writer(output)
+            writer.writerow(["kind", "name"] + fields)
+            writer.writerow(["frame", "frame"] + [self.frame.to_dict()[x] for x in fields])
+            for name, stat in self.phase_stats().items():
+                writer.writerow(["phase", name] + [stat[x] for x in fields])
+            for name, stat in sorted(self.component_stats().items()):
+                writer.writerow(["component", name] + [stat[x] for x in fields])
@@ -1,97 +1,983 @@
 import pygame
+import weakref
+from collections import namedtuple, OrderedDict
+from timeit import default_timer
 from . import components
+from .assets import Assets
 from engine.math import Vector2, Rect
-from pygame import transform
 from .interface import SpriteElement
+from .transformcache import TransformCache
+
+
+def get_background_color(tiled_map):
+    """
+    :param pytmx.TiledMap tiled_map: Map
+    :return: Map's background color as RGB tuple, black if the map has none
+    """
+    if not tiled_map.background_color:
+        return 0, 0, 0
+    color = ["".join(tiled_map.background_color[i:i+2]) for i in range(1, len(tiled_map.background_color) - 1, 2)]
+    return tuple(int(x, 16) for x in color)
+
+
+def get_tile_overflow(tiled_map):
+    """
+    Tile images can be larger than tiles, finds how many tiles they can reach into their neighbours
+
+    :param pytmx.TiledMap tiled_map: Map
+    :return: Tuple with horizontal and vertical overflow in tiles
+    """
+    overflow_x = 0
+    overflow_y = 0
+    for image in tiled_map.images:
+        if image is not None:
+            overflow_x = max(overflow_x, (image.get_width() - tiled_map.tilewidth) / 2.0)
+            overflow_y = max(overflow_y, (image.get_height() - tiled_map.tileheight) / 2.0)
+    return int(-(-overflow_x // tiled_map.tilewidth)), int(-(-overflow_y // tiled_map.tileheight))
+
+
+def get_tile_animations(tiled_map):
+    """
+    Collects animations of the map's tiles
+
+    :param pytmx.TiledMap tiled_map: Map
+    :return: Dictionary of gid to tuple of frames, as list of (gid, end time in milliseconds) tuples, and total
+             duration of the animation in milliseconds
+    """
+    animations = {}
+    for gid, properties in tiled_map.tile_properties.items():
+        frames = []
+        time = 0
+        for frame in properties.get("frames") or []:
+            time += frame.duration
+            frames.append((frame.gid, time))
+        if time > 0:
+            animations[gid] = (frames, time)
+    return animations
+
+
+def scale_surface(surface, size, dest_surface=None, smooth=True):
+    """
+    Scales the surface, smoothly if requested and the surface's format allows it
+
+    :param pygame.Surface surface: Surface to scale
+    :param tuple size: Width and height of the result
+    :param pygame.Surface dest_surface: Surface to scale into, needs to have the given size and surface's format
+    :param bool smooth: Filters the result if True, uses nearest neighbour otherwise
+    :rtype: pygame.Surface
+    """
+    if smooth and surface.get_bitsize() >= 24:
+        if dest_surface is None:
+            return pygame.transform.smoothscale(surface, size)
+        return pygame.transform.smoothscale(surface, size, dest_surface)
+    if dest_surface is None:
+        return pygame.transform.scale(surface, size)
+    return pygame.transform.scale(surface, size, dest_surface)
+
+
+class DynamicRenderScale(object):
+    """
+    Picks the render scale which keeps drawing a frame within a time budget. Drawing time is smoothed over several
+    frames, the scale is lowered by a step once the smoothed time exceeds the budget and raised again once the
+    larger scale, whose cost grows with its square, is expected to fit the budget with some headroom
+
+    :type target_time: float
+    :type min_scale: float
+    :type step: float
+    :type integer: bool
+    :type average: float
+    """
+    # Scaling up is only tried if the predicted time is below this fraction of the budget
+    HEADROOM = 0.85
+
+    def __init__(self, target_time, min_scale=0.5, step=0.0625, integer=False, smoothing=0.1, cooldown=30):
+        """
+        :param float target_time: Time in seconds drawing a frame should take
+        :param float min_scale: Lowest allowed render scale
+        :param float step: Change of the scale per adjustment, ignored if integer is set
+        :param bool integer: Only uses scales which are reciprocals of integers (1, 1/2, 1/3...)
+        :param float smoothing: Weight of the newest frame in the smoothed drawing time
+        :param int cooldown: Minimum number of frames between two adjustments
+        """
+        if target_time <= 0:
+            raise ValueError("Target time has to be positive")
+        if not 0 < min_scale <= 1:
+            raise ValueError("Minimum scale has to be within (0, 1]")
+
+        self.target_time = target_time
+        self.min_scale = min_scale
+        self.step = step
+        self.integer = integer
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.average = None
+        self._frames = 0
+
+    def update(self, elapsed, scale):
+        """
+        :param float elapsed: Time in seconds the last frame took to draw
+        :param float scale: Render scale the frame was drawn with
+        :return: Render scale for the next frame
+        """
+        if self.average is None:
+            self.average = elapsed
+        else:
+            self.average += (elapsed - self.average) * self.smoothing
+        self._frames += 1
+        if self._frames < self.cooldown:
+            return scale
+
+        lower, higher = self._neighbours(scale)
+        if self.average > self.target_time and lower is not None:
+            new_scale = lower
+        elif higher is not None and self.average * (higher / scale) ** 2 < self.target_time * self.HEADROOM:
+            new_scale = higher
+        else:
+            return scale
+
+        self._frames = 0
+        self.average *= (new_scale / scale) ** 2
+        return new_scale
+
+    def _neighbours(self, scale):
+        """
+        :return: Next lower and higher allowed scale, None where there is none
+        """
+        if self.integer:
+            divisor = int(round(1.0 / scale))
+            lower = 1.0 / (divisor + 1) if 1.0 / (divisor + 1) >= self.min_scale else None
+            higher = 1.0 / (divisor - 1) if divisor > 1 else None
+        else:
+            lower = scale - self.step if scale - self.step >= self.min_scale - 1e-9 else None
+            higher = min(scale + self.step, 1.0) if scale < 1 else None
+        return lower, higher
+
+
+# Renderable as captured for drawing. Source is the sprite's image with flips applied or the map's pytmx map. Rotated
+# sprites keep their image unflipped, flip holds horizontal and vertical flips applied after rotating, otherwise None
+RenderItem = namedtuple("RenderItem", ["renderable", "layer", "source", "world_position", "position", "rotation",
+                                       "scale", "flip"])
+# Interface element as captured for drawing, surface is None for elements which draw nothing
+InterfaceItem = namedtuple("InterfaceItem", ["element", "dirty", "surface", "position", "bounds"])
+# Everything needed to draw a frame of a scene, taken by Renderer.capture. Camera is a tuple of top left corner and
+# rotation, time is the scene's time used to animate tiles. Interface surfaces are copies, sprite images and tile
+# data are the scene's own
+RenderSnapshot = namedtuple("RenderSnapshot", ["background", "camera", "time", "items", "culled", "canvas",
+                                               "interface", "interface_dirty"])
+
+
+class TileChunks(object):
+    """
+    Tile layers of a map pre-rendered into square chunk surfaces, so that drawing a map costs a few blits per
+    screen instead of one per tile. Consecutive static layers are baked together, layers containing animated tiles
+    are kept apart in groups of their own and drawn tile by tile. Chunks are baked on first use, the bottom group
+    is baked onto map's background color so that its chunks are opaque. Baked chunks are kept up to a memory cap,
+    least recently used ones are evicted first
+
+    :type map: pytmx.TiledMap
+    :type chunk_size: int
+    :type scale: float
+    :type scaled_size: int
+    :type groups: list
+    :type max_bytes: int
+    :type bytes: int
+    :type baked: int
+    :type evictions: int
+    """
+    def __init__(self, tiled_map, chunk_size=512, scale=1.0, max_bytes=32 * 1024 * 1024):
+        """
+        :param pytmx.TiledMap tiled_map: Map to render
+        :param int chunk_size: Width and height of a chunk in map's pixels
+        :param float scale: Chunks are baked scaled down by this factor, so that they can be drawn into a reduced
+                            resolution target
+        :param int max_bytes: Memory cap of all baked chunks' pixels
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size has to be positive")
+        if max_bytes < 0:
+            raise ValueError("Memory cap cannot be negative")
+
+        self.map = tiled_map
+        self.chunk_size = chunk_size
+        self.scale = scale
+        # Chunks are placed this many pixels apart, rounding the scaled size keeps neighbouring chunks seamless
+        self.scaled_size = max(int(round(chunk_size * scale)), 1)
+        self.layers = list(tiled_map.visible_tile_layers)
+        self.width = tiled_map.width * tiled_map.tilewidth
+        self.height = tiled_map.height * tiled_map.tileheight
+
+        # List of (static, layers) tuples in drawing order
+        self.groups = []
+        animations = get_tile_animations(tiled_map)
+        for layer in self.layers:
+            static = not any(gid in animations for row in tiled_map.layers[layer].data for gid in row)
+            if static and len(self.groups) > 0 and self.groups[-1][0]:
+                self.groups[-1][1].append(layer)
+            else:
+                self.groups.append((static, [layer]))
+
+        self._margin = get_tile_overflow(tiled_map)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.baked = 0
+        self.evictions = 0
+        # Group and chunk coordinates to (surface, size in bytes), surface is None for empty chunks
+        self._chunks = OrderedDict()
+
+    def is_valid(self):
+        """
+        Checks if the chunks still reflect which of the map's tile layers are visible
+
+        :rtype: bool
+        """
+        return list(self.map.visible_tile_layers) == self.layers
+
+    def chunks_in_area(self, area):
+        """
+        Returns coordinates of chunks intersecting the area
+
+        :param Rect area: Area in map's coordinates
+        :return: List of x/y chunk coordinate tuples
+        """
+        left = max(int(area.left // self.chunk_size), 0)
+        top = max(int(area.top // self.chunk_size), 0)
+        right = min(int((area.right - 1) // self.chunk_size), int((self.width - 1) // self.chunk_size))
+        bottom = min(int((area.bottom - 1) // self.chunk_size), int((self.height - 1) // self.chunk_size))
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def get_chunk(self, group, x, y):
+        """
+        Returns the baked surface of a static group's chunk, scaled if the chunks are
+
+        :param int group: Index of the group
+        :param int x: Chunk column
+        :param int y: Chunk row
+        :return: Surface, None if nothing is drawn within the chunk
+        """
+        key = (group, x, y)
+        entry = self._chunks.get(key)
+        if entry is not None:
+            self._chunks.move_to_end(key)
+            return entry[0]
+
+        chunk = self._bake(self.groups[group][1], x, y)
+        self.baked += 1
+        size = chunk.get_pitch() * chunk.get_height() if chunk is not None else 0
+        if size <= self.max_bytes:
+            self._chunks[key] = (chunk, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._evict()
+        return chunk
+
+    def discard_distant(self, area, distance=1):
+        """
+        Evicts chunks further than the given number of chunks away from the area
+
+        :param Rect area: Area in map's coordinates, usually the one visible on screen
+        :param int distance: Chunks this many chunks away from the area are kept
+        """
+        left = int(area.left // self.chunk_size) - distance
+        top = int(area.top // self.chunk_size) - distance
+        right = int((area.right - 1) // self.chunk_size) + distance
+        bottom = int((area.bottom - 1) // self.chunk_size) + distance
+        for key in [x for x in self._chunks if not (left <= x[1] <= right and top <= x[2] <= bottom)]:
+            chunk, size = self._chunks.pop(key)
+            self.bytes -= size
+            self.evictions += 1
+
+    def _evict(self):
+        key, (chunk, size) = self._chunks.popitem(last=False)
+        self.bytes -= size
+        self.evictions += 1
+
+    def _bake(self, layers, chunk_x, chunk_y):
+        tiled_map = self.map
+        tile_width = tiled_map.tilewidth
+        tile_height = tiled_map.tileheight
+        size = self.chunk_size
+        offset_x = chunk_x * size
+        offset_y = chunk_y * size
+
+        left = max(offset_x // tile_width - self._margin[0], 0)
+        top = max(offset_y // tile_height - self._margin[1], 0)
+        right = min((offset_x + size - 1) // tile_width + self._margin[0], tiled_map.width - 1)
+        bottom = min((offset_y + size - 1) // tile_height + self._margin[1], tiled_map.height - 1)
+
+        chunk = None
+        for layer in layers:
+            data = tiled_map.layers[layer].data
+            for y in range(top, bottom + 1):
+                row = data[y]
+                for x in range(left, right + 1):
+                    gid = row[x]
+                    if gid == 0:
+                        continue
+                    image = tiled_map.images[gid]
+                    if image is None:
+                        continue
+                    if chunk is None:
+                        chunk = self._create_chunk(layers, min(size, self.width - offset_x),
+                                                   min(size, self.height - offset_y))
+                    center = (x * tile_width + tile_width / 2 - offset_x, y * tile_height + tile_height / 2 - offset_y)
+                    chunk.blit(image, image.get_rect(center=center))
+
+        if chunk is not None and self.scale != 1:
+            # Chunks at the map's edge are smaller, they still have to start where the stride puts them
+            chunk = scale_surface(chunk, tuple(self.scaled_size if x == size else max(int(round(x * self.scale)), 1)
+                                               for x in chunk.get_size()))
+        return chunk
+
+    def _create_chunk(self, layers, width, height):
+        if layers is self.groups[0][1]:
+            chunk = pygame.Surface((width, height))
+            chunk.fill(get_background_color(self.map))
+            if pygame.display.get_surface() is not None:
+                chunk = chunk.convert()
+        else:
+            chunk = pygame.Surface((width, height), pygame.SRCALPHA)
+            if pygame.display.get_surface() is not None:
+                chunk = chunk.convert_alpha()
+        return chunk
+
+
+class RenderQueue(object):
+    """
+    Collects draw commands of a frame and submits them ordered by layer, in batches through Surface.blits. Commands
+    on the same layer keep the order they were added in
+
+    :type batch_size: int
+    :type issued: int
+    :type culled: int
+    """
+    def __init__(self, batch_size=1024):
+        """
+        :param int batch_size: Maximum number of blits submitted in a single call
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size has to be positive")
+
+        self.batch_size = batch_size
+        self.issued = 0
+        self.culled = 0
+        self._layers = {}
+
+    def __len__(self):
+        return sum(len(x) for x in self._layers.values())
+
+    def add(self, layer, surface, destination):
+        """
+        :param int layer: Layer to draw on, lower layers are drawn first
+        :param pygame.Surface surface: Surface to draw
+        :param destination: Position or rectangle on the target
+        """
+        commands = self._layers.get(layer)
+        if commands is None:
+            commands = self._layers[layer] = []
+        commands.append((surface, destination))
+
+    def cull(self, count=1):
+        """
+        Counts draw calls which were skipped because they would not be visible
+        """
+        self.culled += count
+
+    def submit(self, target):
+        """
+        Draws all collected commands onto the target and empties the queue
+
+        :param pygame.Surface target: Surface to draw onto
+        """
+        batch_size = self.batch_size
+        for layer in sorted(self._layers):
+            commands = self._layers[layer]
+            for start in range(0, len(commands), batch_size):
+                target.blits(commands[start:start + batch_size], False)
+            self.issued += len(commands)
+        self._layers.clear()
+
+    def reset_stats(self):
+        self.issued = 0
+        self.culled = 0
 
 
 class Renderer(object):
     """
+    Maps can be drawn in one of the following tile modes:
+
+    - TILES_CHUNKED: static layers are blitted from pre-rendered chunks, layers with animated tiles as in TILES_CULLED
+    - TILES_CULLED: only tiles within the camera's range are drawn, read directly from layer data every frame, so
+      changed and animated tiles are always up to date
+    - TILES_ALL: every tile of the map is tested against the camera
+
+    The world can be drawn at a reduced resolution into an offscreen target, which is then upscaled onto the screen
+    in one step, either smoothly or by nearest neighbour (UPSCALE_INTEGER, which only allows scales 1/2, 1/3... and
+    letterboxes screens whose size is not a multiple of the divisor).
+    The interface is always drawn at full resolution. Dirty rectangles are only used at full render scale
+
     :type screen: pygame.Surface
+    :type target: pygame.Surface
+    :type upscale: str
+    :type dynamic_scale: DynamicRenderScale
+    :type tile_mode: str
+    :type tile_chunk_size: int
+    :type tile_chunk_bytes: int
+    :type transform_cache: engine.transformcache.TransformCache
+    :type dirty_rects: bool
+    :type update_rects: list
+    :type queue: RenderQueue
     """
-    def __init__(self, screen):
+    TILES_CHUNKED = "chunked"
+    TILES_CULLED = "culled"
+    TILES_ALL = "all"
+    UPSCALE_SMOOTH = "smooth"
+    UPSCALE_INTEGER = "integer"
+    # Smooth render scales are rounded to multiples of this, so that cached scaled images can be reused
+    RENDER_SCALE_STEP = 1 / 32.0
+    # Fraction of the screen above which dirty rectangles are given up on and the whole screen is redrawn
+    DIRTY_AREA_LIMIT = 0.5
+
+    def __init__(self, screen, tile_mode=TILES_CHUNKED, tile_chunk_size=512, tile_chunk_bytes=32 * 1024 * 1024,
+                 transform_cache_bytes=64 * 1024 * 1024, dirty_rects=False, render_scale=1.0, upscale=UPSCALE_SMOOTH,
+                 target_render_time=None, min_render_scale=0.5):
+        """
+        :param pygame.Surface screen: Surface to render to
+        :param str tile_mode: How maps are drawn, one of the TILES_* constants
+        :param int tile_chunk_size: Size of pre-rendered map chunks in pixels
+        :param int tile_chunk_bytes: Memory cap of each map's pre-rendered chunks
+        :param int transform_cache_bytes: Memory cap of cached rotated, scaled and flipped images
+        :param bool dirty_rects: If True, only regions which changed since the previous frame are redrawn and
+                                 presented while the camera stands still
+        :param float render_scale: Resolution of the world relative to the screen, within (0, 1]
+        :param str upscale: How the world is upscaled onto the screen, one of the UPSCALE_* constants
+        :param float target_render_time: If set, render scale is adjusted to keep drawing a frame within this many
+                                         seconds
+        :param float min_render_scale: Lowest render scale used when adjusting it
+        """
+        if tile_mode not in (self.TILES_CHUNKED, self.TILES_CULLED, self.TILES_ALL):
+            raise ValueError("Unknown tile mode: {0}".format(tile_mode))
+        if upscale not in (self.UPSCALE_SMOOTH, self.UPSCALE_INTEGER):
+            raise ValueError("Unknown upscale mode: {0}".format(upscale))
+
         self.screen = screen
+        self.tile_mode = tile_mode
+        self.tile_chunk_size = tile_chunk_size
+        self.tile_chunk_bytes = tile_chunk_bytes
+        self.transform_cache = TransformCache(transform_cache_bytes)
+        self.dirty_rects = dirty_rects
+        self.upscale = upscale
+        self.render_scale = render_scale
+        # Surface the world is drawn into, the screen itself at full render scale
+        self.target = screen
+        # Screen area the target is upscaled into, smaller than the screen if integer upscaling does not fill it
+        self._upscale_area = screen.get_rect()
+        self.dynamic_scale = None
+        if target_render_time is not None:
+            self.dynamic_scale = DynamicRenderScale(target_render_time, min_render_scale,
+                                                    integer=upscale == self.UPSCALE_INTEGER)
+        # Draw calls issued and culled are counted per frame
+        self.queue = RenderQueue()
+        # Screen regions changed by the last render, None if the whole screen was redrawn
+        self.update_rects = None
+        # Camera, renderables and interface elements as they were drawn in the previous frame
+        self._previous_frame = None
+        self._tile_chunks = weakref.WeakKeyDictionary()
+        # Overflow and animations of every map, keyed by pytmx map
+        self._tile_info = weakref.WeakKeyDictionary()
+        # Interface element to its surface and the copy of it captured last
+        self._interface_copies = weakref.WeakKeyDictionary()
+
+    @property
+    def render_scale(self):
+        """
+        Resolution of the world relative to the screen. Assigned values are rounded to the nearest scale allowed by
+        the upscale mode
+
+        :rtype: float
+        """
+        return self._render_scale
+
+    @render_scale.setter
+    def render_scale(self, value):
+        if not 0 < value <= 1:
+            raise ValueError("Render scale has to be within (0, 1]")
+        if self.upscale == self.UPSCALE_INTEGER:
+            value = 1.0 / int(round(1.0 / value))
+        else:
+            value = max(round(value / self.RENDER_SCALE_STEP) * self.RENDER_SCALE_STEP, self.RENDER_SCALE_STEP)
+        self._render_scale = value
+
+    def invalidate_tiles(self, tiled_map=None):
+        """
+        Discards pre-rendered chunks, has to be called after tiles of a map are changed
+
+        :param engine.components.TiledMap tiled_map: Map whose chunks are discarded, all maps if None
+        """
+        if tiled_map is None:
+            self._tile_chunks.clear()
+            self._tile_info.clear()
+        else:
+            self._tile_chunks.pop(tiled_map, None)
+            if tiled_map.map is not None:
+                self._tile_info.pop(tiled_map.map, None)
+
+    def invalidate(self):
+        """
+        Makes the next render redraw the whole screen, needed if the screen was drawn onto outside the renderer
+        """
+        self._previous_frame = None
 
-    def render(self, scene):
+    def render(self, scene, alpha=1.0):
         """
         Renders current state of scene
 
         :param engine.scene.Scene scene: Scene to render
+        :param float alpha: Interpolation between previous and current state of transforms, 1 renders current state
+        """
+        self.draw(self.capture(scene, alpha))
+
+    def capture(self, scene, alpha=1.0):
+        """
+        Takes a snapshot of everything needed to draw the current state of the scene. The snapshot can be drawn later,
+        even while the scene is being simulated further on another thread. Surfaces of interface elements are copied,
+        a copy is reused until its element is marked dirty. Sprite images and tile data of maps are still read from
+        the scene when drawing, so they must not be drawn onto or changed meanwhile. Capturing marks the interface as
+        drawn
+
+        :param engine.scene.Scene scene: Scene to capture
+        :param float alpha: Interpolation between previous and current state of transforms, 1 captures current state
+        :rtype: RenderSnapshot
         """
         tiled_map = scene.get_object_of_type(components.TiledMap)
         if tiled_map is not None:
-            color = ["".join(tiled_map.map.background_color[i:i+2])
-                     for i in range(1, len(tiled_map.map.background_color) - 1, 2)]
-            self.screen.fill(tuple(int(x, 16) for x in color))
+            background = get_background_color(tiled_map.map)
         else:
-            self.screen.fill((0, 0, 0))
+            background = (0, 0, 0)
 
         camera_position = (Vector2(0, 0), 0)
         if scene.camera is not None:
             camera = scene.camera.get_component(components.Camera)
-            transform = scene.camera.get_component(components.Transform)
+            transform = scene.camera.transform
             if transform is not None:
-                camera_position = (Vector2(transform.position[0], transform.position[1]), transform.rotation)
+                camera_position = (Vector2(transform.interpolated_position(alpha)), transform.interpolated_rotation(alpha))
 
         camera_position[0][0] -= self.screen.get_width()/2
         camera_position[0][1] -= self.screen.get_height()/2
 
-        for obj in list(scene.objects.values()):
-            renderables = obj.get_components(components.Renderable)
-            for rend in renderables:
-                if rend.should_render is True:
-                    self._render(rend, camera_position)
+        # Extra pixel on each side covers rounding of fractional camera positions
+        view = Rect(camera_position[0][0] - 1, camera_position[0][1] - 1,
+                    self.screen.get_width() + 2, self.screen.get_height() + 2)
+        renderables = scene.get_renderables_in_area(view)
+        culled = scene.renderable_count - len(renderables)
+        items = []
+        for rend in renderables:
+            if isinstance(rend, components.SpriteRenderer):
+                source = rend.get_render_image()
+                if source is None:
+                    culled += 1
+                    continue
+            elif isinstance(rend, components.TiledMap) and rend.map is not None:
+                source = rend.map
+            else:
+                continue
+            world_position, position, rotation, scale = self._get_placement(rend, camera_position, alpha)
+            flip = None
+            if isinstance(rend, components.SpriteRenderer) and source is not rend.image and rotation % 360 != 0:
+                # Rotation does not sample a flipped image the same way, so rotated sprites are flipped afterwards
+                source = rend.image
+                flip = (rend.horizontal_flip, rend.vertical_flip)
+            items.append(RenderItem(rend, rend.layer, source, Vector2(world_position), position, rotation, scale,
+                                    flip))
+
+        canvas = scene.interface
+        elements = ()
+        interface_dirty = False
+        if canvas is not None:
+            elements = tuple(InterfaceItem(x, x.dirty, self._copy_interface_surface(x),
+                                           (x.position.x, x.position.y),
+                                           Rect(x.position.x, x.position.y, x.width, x.height))
+                             for x in canvas.get_children())
+            interface_dirty = canvas.dirty
+            canvas.clear_dirty()
 
-        if scene.interface is not None:
-            self._render_interface(scene.interface)
+        return RenderSnapshot(background, camera_position, scene.time, tuple(items), culled, canvas, elements,
+                              interface_dirty)
+
+    def draw(self, snapshot):
+        """
+        Draws a snapshot taken by capture
+
+        :param RenderSnapshot snapshot: Snapshot to draw
+        """
+        start = default_timer()
+        self.queue.reset_stats()
+        self.queue.cull(snapshot.culled)
+        self._update_target()
+        if snapshot.canvas is not None and snapshot.canvas.compose:
+            self._compose_interface(snapshot)
+
+        if not self.dirty_rects or self.target is not self.screen:
+            self.update_rects = None
+            self._previous_frame = None
+            self._draw(snapshot)
+        else:
+            self._draw_dirty(snapshot)
 
-    def _render(self, renderable, camera_position):
-        surface_rect = self.screen.get_rect(center=camera_position[0] + Vector2(self.screen.get_width()/2, self.screen.get_height()/2))
+        if self.dynamic_scale is not None:
+            self.render_scale = self.dynamic_scale.update(default_timer() - start, self.render_scale)
 
-        obj_transform = renderable.game_object.get_component(components.Transform)
+    def stats(self):
+        """
+        :return: Dictionary with draw calls issued and culled during the last frame, current render scale and
+                 transform cache statistics
+        """
+        return {
+            "draw_calls": self.queue.issued,
+            "culled": self.queue.culled,
+            "render_scale": self.render_scale,
+            "transform_cache": self.transform_cache.stats(),
+        }
+
+    def present(self):
+        """
+        Shows the last rendered frame on the display, updating only the changed regions if known
+        """
+        if self.update_rects is None:
+            pygame.display.flip()
+        elif len(self.update_rects) > 0:
+            pygame.display.update(self.update_rects)
+
+    def _draw(self, snapshot, area=None):
+        target = self.target
+        target.fill(snapshot.background, area)
+        for item in snapshot.items:
+            self._render(item, snapshot, area)
+        self.queue.submit(target)
+        if target is not self.screen:
+            upscale_area = self._upscale_area
+            if upscale_area.size != self.screen.get_size():
+                # Screen left uncovered by whole multiples of the target is letterboxed
+                self.screen.fill(snapshot.background)
+            scale_surface(target, upscale_area.size, self.screen.subsurface(upscale_area),
+                          self.upscale == self.UPSCALE_SMOOTH)
+
+        if snapshot.canvas is not None:
+            if snapshot.canvas.compose:
+                self.screen.blit(snapshot.canvas.overlay, (0, 0))
+            else:
+                self._draw_interface(snapshot.interface, self.screen)
+
+    def _draw_dirty(self, snapshot):
+        self.update_rects = self._find_dirty_areas(snapshot)
+        if self.update_rects is None:
+            self._draw(snapshot)
+        else:
+            for area in self.update_rects:
+                self.screen.set_clip(area)
+                self._draw(snapshot, area)
+            self.screen.set_clip(None)
+
+    def _update_target(self):
+        """
+        Makes sure the target matches current render scale and screen size
+        """
+        if self._render_scale == 1:
+            self.target = self.screen
+            return
+
+        width, height = self.screen.get_size()
+        if self.upscale == self.UPSCALE_INTEGER:
+            divisor = int(round(1.0 / self._render_scale))
+            size = (max(width // divisor, 1), max(height // divisor, 1))
+            # Every target pixel covers exactly divisor by divisor screen pixels, centered on the screen
+            upscaled = (min(size[0] * divisor, width), min(size[1] * divisor, height))
+            self._upscale_area = Rect(((width - upscaled[0]) // 2, (height - upscaled[1]) // 2), upscaled)
+        else:
+            size = (max(int(round(width * self._render_scale)), 1), max(int(round(height * self._render_scale)), 1))
+            self._upscale_area = self.screen.get_rect()
+        if self.target is self.screen or self.target.get_size() != size:
+            self.target = pygame.Surface(size, 0, self.screen)
+
+    def _find_dirty_areas(self, snapshot):
+        """
+        Compares what is going to be drawn with the previous frame
+
+        :return: List of screen rectangles which have to be redrawn, None if the whole screen has to be redrawn
+        """
+        screen_rect = self.screen.get_rect()
+        camera = (tuple(snapshot.camera[0]), snapshot.camera[1], screen_rect.size)
+        full_redraw = False
+        sprites = {}
+        for item in snapshot.items:
+            if isinstance(item.renderable, components.SpriteRenderer):
+                surface = self._transform_sprite(item, item.scale)
+                sprites[item.renderable] = (surface, surface.get_rect(center=item.position), item.layer)
+            else:
+                # Maps are redrawn whenever they change, animated tiles change all the time
+                sprites[item.renderable] = (item.source, (tuple(item.position), item.rotation, item.scale),
+                                            item.layer)
+                full_redraw = full_redraw or len(self._get_tile_info(item.source)[1]) > 0
+
+        elements = dict((x.element, (x.dirty, x.bounds)) for x in snapshot.interface)
+
+        previous = self._previous_frame
+        self._previous_frame = (camera, sprites, elements)
+        if full_redraw or previous is None or previous[0] != camera:
+            return None
+
+        areas = []
+        for rend, (drawn, bounds, layer) in sprites.items():
+            old = previous[1].get(rend)
+            if old is None or old[0] is not drawn or old[1] != bounds or old[2] != layer:
+                if isinstance(rend, components.TiledMap):
+                    return None
+                areas.append(bounds)
+                if old is not None:
+                    areas.append(old[1])
+        for rend, old in previous[1].items():
+            if rend not in sprites:
+                if isinstance(rend, components.TiledMap):
+                    return None
+                areas.append(old[1])
+
+        for element, (dirty, bounds) in elements.items():
+            old = previous[2].get(element)
+            if dirty or old is None or old[1] != bounds:
+                areas.append(bounds)
+                if old is not None:
+                    areas.append(old[1])
+        for element, old in previous[2].items():
+            if element not in elements:
+                areas.append(old[1])
+
+        areas = _merge_rects(x.clip(screen_rect) for x in areas)
+        if sum(x.width * x.height for x in areas) > screen_rect.width * screen_rect.height * self.DIRTY_AREA_LIMIT:
+            return None
+        return areas
+
+    def _get_placement(self, renderable, camera_position, alpha):
+        """
+        :return: World position, screen position, rotation and scale of the renderable
+        """
+        obj_transform = renderable.game_object.transform
         if obj_transform is not None:
-            position = Vector2(obj_transform.position[0], obj_transform.position[1]) - camera_position[0]
-            rotation = obj_transform.rotation - camera_position[1]
+            world_position = obj_transform.interpolated_position(alpha)
+            position = world_position - camera_position[0]
+            rotation = obj_transform.interpolated_rotation(alpha) - camera_position[1]
             scale = obj_transform.scale
         else:
+            world_position = Vector2(0, 0)
             position = Vector2(0, 0)
             rotation = 0
             scale = 1
+        return world_position, position, rotation, scale
+
+    def _get_tile_info(self, tiled_map):
+        """
+        :return: Overflow and animations of the map's tiles
+        """
+        info = self._tile_info.get(tiled_map)
+        if info is None:
+            info = self._tile_info[tiled_map] = (get_tile_overflow(tiled_map), get_tile_animations(tiled_map))
+        return info
 
-        if isinstance(renderable, components.SpriteRenderer):
-            if renderable.image is not None and \
-                    surface_rect.colliderect(renderable.image.get_rect(center=obj_transform.position)):
-                self._render_image(renderable.image, position, rotation, scale,
-                                   renderable.vertical_flip, renderable.horizontal_flip)
-        elif isinstance(renderable, components.TiledMap):
-            tiled_map = renderable.map
-            if tiled_map is not None:
-                tile_width = tiled_map.tilewidth
-                tile_height = tiled_map.tileheight
+    def _render(self, item, snapshot, area=None):
+        """
+        :param RenderItem item: Renderable to draw
+        :param RenderSnapshot snapshot: Snapshot the renderable belongs to
+        :param Rect area: Screen area to draw, whole screen if None
+        """
+        camera_position = snapshot.camera
+        if area is None:
+            surface_rect = self.screen.get_rect(center=camera_position[0] + Vector2(self.screen.get_width()/2,
+                                                                                    self.screen.get_height()/2))
+        else:
+            # Rect truncates fractional camera positions, the extra pixel makes sure partially visible tiles are drawn
+            surface_rect = area.move(camera_position[0][0], camera_position[0][1]).inflate(2, 2)
+
+        # Everything is placed in screen coordinates, which are then scaled down to the target
+        render_scale = self._render_scale
+        if isinstance(item.renderable, components.SpriteRenderer):
+            if area is not None or surface_rect.colliderect(item.source.get_rect(center=item.world_position)):
+                surface = self._transform_sprite(item, item.scale * render_scale)
+                rect = surface.get_rect(center=item.position * render_scale)
+                if area is None or rect.colliderect(area):
+                    self.queue.add(item.layer, surface, rect)
+                    return
+            self.queue.cull()
+        elif isinstance(item.renderable, components.TiledMap):
+            tiled_map = item.source
+            if self.tile_mode == self.TILES_ALL:
                 for layer in tiled_map.visible_tile_layers:
-                    for x, y, image in tiled_map.layers[layer].tiles():
-                        tile_position = Vector2(x * tile_width + tile_width/2, y * tile_height + tile_height/2)
-                        if renderable.get_rectangle_for_tile((x,y)).colliderect(surface_rect):
-                            self._render_image(image, tile_position + position, rotation, scale)
+                    self._render_tile_layer(item, layer, surface_rect)
+            elif self.tile_mode == self.TILES_CHUNKED and item.rotation == 0 and item.scale == 1:
+                self._render_tile_chunks(item, snapshot.time, surface_rect)
+            else:
+                self._render_tile_window(item, list(tiled_map.visible_tile_layers), item.rotation, item.scale,
+                                         snapshot.time, surface_rect)
 
-    def _render_image(self, image, position, rotation, scale, ver_flip=False, hor_flip=False):
-        surface = pygame.transform.rotozoom(image, rotation, scale)
-        if ver_flip or hor_flip:
-            surface = pygame.transform.flip(surface, hor_flip, ver_flip)
+    def _transform_sprite(self, item, scale):
+        """
+        :return: Sprite's image rotated, scaled and flipped for drawing
+        """
+        surface = self.transform_cache.get(item.source, item.rotation, scale)
+        if item.flip is not None:
+            surface = Assets.get_flipped(surface, item.flip[0], item.flip[1])
+        return surface
+
+    def _render_tile_layer(self, item, layer, surface_rect):
+        tiled_map = item.source
+        tile_width = tiled_map.tilewidth
+        tile_height = tiled_map.tileheight
+        render_scale = self._render_scale
+        for x, y, image in tiled_map.layers[layer].tiles():
+            tile_position = Vector2(x * tile_width + tile_width/2, y * tile_height + tile_height/2)
+            if item.renderable.get_rectangle_for_tile((x,y)).colliderect(surface_rect):
+                self._render_image(item.layer, image, (tile_position + item.position) * render_scale, item.rotation,
+                                   item.scale * render_scale)
+            else:
+                self.queue.cull()
+
+    def _render_tile_window(self, item, layers, rotation, scale, time, surface_rect):
+        """
+        Draws only tiles within the range visible on screen, looked up directly in layer data
+
+        :param float time: Scene time in seconds, selects frames of animated tiles
+        """
+        tiled_map = item.source
+        world_position = item.world_position
+        position = item.position
+        margin, animations = self._get_tile_info(tiled_map)
+
+        tile_width = tiled_map.tilewidth
+        tile_height = tiled_map.tileheight
+        left = max(int((surface_rect.left - world_position[0]) // tile_width) - margin[0], 0)
+        top = max(int((surface_rect.top - world_position[1]) // tile_height) - margin[1], 0)
+        right = min(int((surface_rect.right - 1 - world_position[0]) // tile_width) + margin[0], tiled_map.width - 1)
+        bottom = min(int((surface_rect.bottom - 1 - world_position[1]) // tile_height) + margin[1],
+                     tiled_map.height - 1)
+        if left > right or top > bottom:
+            self.queue.cull(tiled_map.width * tiled_map.height * len(layers))
+            return
+        self.queue.cull((tiled_map.width * tiled_map.height - (right - left + 1) * (bottom - top + 1)) * len(layers))
+
+        time = int(time * 1000) if animations else 0
+        images = tiled_map.images
+        render_scale = self._render_scale
+        scale *= render_scale
+        transformed = rotation != 0 or scale != 1
+        draw_layer = item.layer
+        add = self.queue.add
+        offset_x = position[0] + tile_width / 2
+        offset_y = position[1] + tile_height / 2
+        for layer in layers:
+            data = tiled_map.layers[layer].data
+            for y in range(top, bottom + 1):
+                row = data[y]
+                center_y = y * tile_height + offset_y
+                for x in range(left, right + 1):
+                    gid = row[x]
+                    if gid == 0:
+                        continue
+                    if gid in animations:
+                        frames, duration = animations[gid]
+                        frame_time = time % duration
+                        gid = next(frame_gid for frame_gid, end in frames if frame_time < end)
+                    image = images[gid]
+                    if image is None:
+                        continue
+                    center = ((x * tile_width + offset_x) * render_scale, center_y * render_scale)
+                    if transformed:
+                        self._render_image(draw_layer, image, Vector2(center), rotation, scale)
+                    else:
+                        add(draw_layer, image, image.get_rect(center=center))
+
+    def _render_tile_chunks(self, item, time, surface_rect):
+        renderable = item.renderable
+        chunks = self._tile_chunks.get(renderable)
+        if chunks is None or chunks.map is not item.source or chunks.chunk_size != self.tile_chunk_size or \
+                chunks.scale != self._render_scale or not chunks.is_valid():
+            chunks = self._tile_chunks[renderable] = TileChunks(item.source, self.tile_chunk_size, self._render_scale,
+                                                                self.tile_chunk_bytes)
+
+        position = item.position * self._render_scale
+        visible = chunks.chunks_in_area(surface_rect.move(-item.world_position[0], -item.world_position[1]))
+        size = chunks.chunk_size
+        stride = chunks.scaled_size
+        chunk_count = -(-chunks.width // size) * -(-chunks.height // size)
+        baked = chunks.baked
+        for group, (static, layers) in enumerate(chunks.groups):
+            if not static:
+                self._render_tile_window(item, layers, 0, 1, time, surface_rect)
+                continue
+
+            self.queue.cull(chunk_count - len(visible))
+            for x, y in visible:
+                chunk = chunks.get_chunk(group, x, y)
+                if chunk is not None:
+                    self.queue.add(item.layer, chunk,
+                                   chunk.get_rect(topleft=(position[0] + x * stride, position[1] + y * stride)))
 
-        self.screen.blit(surface, surface.get_rect(center=position))
+        if chunks.baked != baked:
+            # The camera moved on to new chunks, the ones it left far behind are not going to be needed soon
+            chunks.discard_distant(Rect(-item.position[0], -item.position[1], self.screen.get_width(),
+                                        self.screen.get_height()))
 
-    def _render_interface(self, interface):
+    def _render_image(self, layer, image, position, rotation, scale):
+        surface = self.transform_cache.get(image, rotation, scale)
+        self.queue.add(layer, surface, surface.get_rect(center=position))
+
+    def _copy_interface_surface(self, element):
+        """
+        :return: Copy of the element's surface, None if it draws nothing
         """
+        if not isinstance(element, SpriteElement):
+            return None
+        surface = element.get_surface()
+        if surface is None:
+            return None
+
+        copy = self._interface_copies.get(element)
+        if copy is None or element.dirty or copy[0] is not surface:
+            # Elements may redraw their surface in place, they are marked dirty when they do
+            copy = self._interface_copies[element] = (surface, surface.copy())
+        return copy[1]
 
-        :param engine.interface.Canvas interface: Interface to render
+    def _compose_interface(self, snapshot):
         """
-        for element in interface.get_children():
-            if isinstance(element, SpriteElement):
-                sprite = element.sprite
-                if sprite is not None:
-                    try:
-                        surface = transform.smoothscale(sprite, (element.width, element.height))
-                    except ValueError:
-                        surface = transform.scale(sprite, (element.width, element.height))
-                    self.screen.blit(surface, surface.get_rect(x=element.position.x, y=element.position.y))
+        Redraws the canvas' overlay if any element changed
+        """
+        canvas = snapshot.canvas
+        dirty = snapshot.interface_dirty
+        if canvas.overlay is None or canvas.overlay.get_size() != self.screen.get_size():
+            canvas.overlay = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+            if pygame.display.get_surface() is not None:
+                canvas.overlay = canvas.overlay.convert_alpha()
+            dirty = True
+
+        if dirty:
+            canvas.overlay.fill((0, 0, 0, 0))
+            self._draw_interface(snapshot.interface, canvas.overlay)
+
+    def _draw_interface(self, elements, surface):
+        for element in elements:
+            if element.surface is not None:
+                surface.blit(element.surface, element.position)
+
+
+def _merge_rects(rects):
+    """
+    Merges overlapping rectangles into their unions, skipping empty ones
+
+    :return: List of rectangles which do not overlap each other
+    """
+    merged = []
+    for rect in rects:
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect = rect.union(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
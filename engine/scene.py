@@ -1,5 +1,7 @@
 import collections
 from .components import *
+from .broadphase import SpatialHashBroadphase
+from .spatial import SpatialHash
 
 
 class ObjectInScene(Exception):
@@ -11,6 +13,128 @@ class ObjectInScene(Exception):
         self.object = obj
 
 
+class _ObjectIndex(object):
+    """
+    Multimap from arbitrary keys to game objects. Objects in every bucket are kept in the same order as in
+    Scene.objects (ascending ids), buckets which went out of order are lazily sorted on the next lookup
+    """
+    def __init__(self):
+        self._buckets = {}
+        self._unsorted = set()
+
+    def add(self, key, obj):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = collections.OrderedDict()
+        elif obj.id not in bucket and next(reversed(bucket)) > obj.id:
+            self._unsorted.add(key)
+        bucket[obj.id] = obj
+
+    def discard(self, key, obj):
+        bucket = self._buckets.get(key)
+        if bucket is not None and bucket.get(obj.id) is obj:
+            del bucket[obj.id]
+            if len(bucket) == 0:
+                del self._buckets[key]
+                self._unsorted.discard(key)
+
+    def get(self, key):
+        """
+        :return: Objects stored under the key, in scene order
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return ()
+
+        if key in self._unsorted:
+            bucket = self._buckets[key] = collections.OrderedDict(sorted(bucket.items()))
+            self._unsorted.discard(key)
+        return bucket.values()
+
+
+class _RenderableIndex(object):
+    """
+    Spatial index of renderables' world bounds. Bounds are only recomputed for objects marked as changed, renderables
+    whose bounds are not known (such as maps) are returned by every query
+    """
+    def __init__(self, cell_size=256):
+        self._grid = SpatialHash(cell_size)
+        # Renderables with unknown bounds, in order they were indexed
+        self._unbounded = collections.OrderedDict()
+        # Object id to list of its indexed renderables
+        self._indexed = {}
+        # Object id to object, for objects whose bounds have to be recomputed
+        self._changed = {}
+
+    def __len__(self):
+        return len(self._grid) + len(self._unbounded)
+
+    def mark(self, obj):
+        self._changed[obj.id] = obj
+
+    def remove(self, obj):
+        """
+        Drops the object right away, so that the index never keeps removed objects alive
+        """
+        self._changed.pop(obj.id, None)
+        self._refresh(obj.id, None)
+
+    def query(self, area, scene):
+        """
+        :param engine.math.Rect area: Area in world coordinates
+        :param Scene scene: Scene the index belongs to
+        :return: Renderables which might overlap the area, in scene order
+        """
+        if len(self._changed) > 0:
+            for obj_id, obj in self._changed.items():
+                self._refresh(obj_id, obj if scene.objects.get(obj_id) is obj else None)
+            self._changed.clear()
+
+        found = self._grid.query(area)
+        found.extend(self._unbounded)
+        found.sort(key=lambda x: (x.game_object.id, x.game_object.components.index(x)))
+        return found
+
+    def _refresh(self, obj_id, obj):
+        for rend in self._indexed.pop(obj_id, ()):
+            if rend in self._unbounded:
+                del self._unbounded[rend]
+            else:
+                self._grid.remove(rend)
+
+        if obj is None:
+            return
+
+        indexed = []
+        for rend in obj.get_components(Renderable):
+            if isinstance(rend, SpriteRenderer):
+                bounds = self._get_sprite_bounds(rend, obj.transform)
+                if bounds is None:
+                    continue
+                self._grid.insert(rend, bounds)
+            else:
+                self._unbounded[rend] = None
+            indexed.append(rend)
+        if len(indexed) > 0:
+            self._indexed[obj_id] = indexed
+
+    @staticmethod
+    def _get_sprite_bounds(sprite, transform):
+        """
+        :return: Rectangle covering the sprite's image anywhere between its previous and current position
+        """
+        if sprite.image is None:
+            return None
+        if transform is None:
+            return sprite.image.get_rect(center=(0, 0)).inflate(2, 2)
+
+        bounds = sprite.image.get_rect(center=transform.position)
+        if transform.previous_position is not None:
+            bounds.union_ip(sprite.image.get_rect(center=transform.previous_position))
+        # Rect rounds the center, the extra pixel covers interpolated positions rounded the other way
+        return bounds.inflate(2, 2)
+
+
 class Scene(object):
     """
     :type objects: dict[int, GameObject]
@@ -20,22 +144,38 @@ class Scene(object):
     :type time: float
     :type game: engine.application.Application
     :type objects_spawn_queue: list
+    :type broadphase: engine.broadphase.Broadphase
+    :type profiler: engine.profiler.Profiler
     """
-    def __init__(self, game):
+    def __init__(self, game, broadphase=None):
         self.objects = collections.OrderedDict()
         self.camera = None
         self.dt = 0
         self.time = 0
         self.game = game
-        self.objects_spawn_queue = []
+        self._spawn_queue = collections.OrderedDict()
         self._remove_queue = []
 
 
         self._maxIndex = 0
         self._current_collisions = set()
+        self._type_index = _ObjectIndex()
+        self._name_index = _ObjectIndex()
+        self._renderable_index = _RenderableIndex()
+        self.broadphase = broadphase if broadphase is not None else SpatialHashBroadphase()
+        self.profiler = None
 
         self.interface = None
 
+    @property
+    def objects_spawn_queue(self):
+        """
+        Objects waiting to be created at the start of next frame, in order they were added
+
+        :rtype: list
+        """
+        return list(self._spawn_queue.values())
+
     def add_object(self, obj):
         """
         Adds a new object to the scene; the object will be queued and created in the world at the start of next frame
@@ -46,10 +186,29 @@ class Scene(object):
         if obj.id is not None or obj.scene:
             raise ObjectInScene(obj, "Object has an id or is assigned to a scene")
 
-        if obj in self.objects_spawn_queue:
+        if id(obj) in self._spawn_queue:
             raise ObjectInScene(obj, "Object is already queued to be added")
 
-        self.objects_spawn_queue.append(obj)
+        self._spawn_queue[id(obj)] = obj
+
+    def add_objects(self, objects):
+        """
+        Adds multiple objects to the scene, behaves like add_object called for every object in order. Objects are
+        validated first, if any of them raises ObjectInScene none of the objects will be queued
+
+        :param objects: Iterable of game objects to add to the scene
+        """
+        queue = self._spawn_queue
+        batch = collections.OrderedDict()
+        for obj in objects:
+            if obj.id is not None or obj.scene:
+                raise ObjectInScene(obj, "Object has an id or is assigned to a scene")
+
+            key = id(obj)
+            if key in queue or key in batch:
+                raise ObjectInScene(obj, "Object is already queued to be added")
+            batch[key] = obj
+        queue.update(batch)
 
     def remove_object(self, obj):
         """
@@ -59,16 +218,31 @@ class Scene(object):
 
         :param engine.gameobject.GameObject obj: Game object to remove from the scene
         """
-        if obj not in self.objects_spawn_queue and (obj.id is None or \
-                        obj.id not in self.objects or self.objects[obj.id] != obj):
+        if self._spawn_queue.pop(id(obj), None) is not None:
+            return
+
+        if obj.id is None or self.objects.get(obj.id) is not obj:
             raise ValueError("Object not found in scene")
 
-        if obj in self.objects_spawn_queue:
-            self.objects_spawn_queue.remove(obj)
-        else:
-            obj = self.objects[obj.id]
-            del self.objects[obj.id]
-            self._remove_queue.append(obj)
+        self._remove_spawned_object(obj)
+
+    def remove_objects(self, objects):
+        """
+        Removes multiple objects from the scene, behaves like remove_object called for every object in order. Objects
+        are validated first, if any of them raises ValueError none of the objects will be removed
+
+        :param objects: Iterable of game objects to remove from the scene
+        """
+        batch = collections.OrderedDict()
+        for obj in objects:
+            if id(obj) in batch or (id(obj) not in self._spawn_queue and
+                                    (obj.id is None or self.objects.get(obj.id) is not obj)):
+                raise ValueError("Object not found in scene")
+            batch[id(obj)] = obj
+
+        for key, obj in batch.items():
+            if self._spawn_queue.pop(key, None) is None:
+                self._remove_spawned_object(obj)
 
     def setup_frame(self, dt):
         """
@@ -86,8 +260,15 @@ class Scene(object):
         """
         Renders a frame before rendering is done
         """
-        self._check_collisions()
+        profiler = self.profiler
+        if profiler is None:
+            self._check_collisions()
+        else:
+            start = profiler.clock()
+            self._check_collisions()
+            profiler.record_phase("collisions", profiler.clock() - start)
 
+        # Objects time their components themselves, so profiled frames run the same update code
         for obj in list(self.objects.values()):
             if not obj.started:
                 obj.start()
@@ -107,6 +288,15 @@ class Scene(object):
         for obj in self._remove_queue:
             obj.scene = None
             obj.id = None
+        del self._remove_queue[:]
+
+    def store_previous_transforms(self):
+        """
+        Stores current state of all transforms as their previous state, used for interpolating rendering between
+        fixed simulation ticks
+        """
+        for transform in self.get_objects_of_type(Transform):
+            transform.store_previous()
 
     def get_object_of_type(self, component_type):
         """
@@ -115,8 +305,10 @@ class Scene(object):
         :param engine.components.BaseComponent component_type: Class of the desired component
         :return: Found component, None if none exist
         """
-        objects = self.get_objects_of_type(component_type)
-        return objects[0] if len(objects) > 0 else None
+        for obj in self._type_index.get(component_type):
+            if not obj.marked_for_deletion:
+                return obj.get_component(component_type)
+        return None
 
     def get_objects_of_type(self, component_type):
         """
@@ -126,21 +318,41 @@ class Scene(object):
         :return: List of all components which were found
         """
         ret = []
-        for key, obj in self.objects.items():
+        for obj in self._type_index.get(component_type):
             if not obj.marked_for_deletion:
-                component = obj.get_component(component_type)
-                if component is not None:
-                    ret.append(component)
+                ret.append(obj.get_component(component_type))
         return ret
 
+    def get_renderables_in_area(self, area):
+        """
+        Finds renderables which might be visible within the area, using a spatial index of their bounds. Sprites are
+        tested by their unrotated images at both their previous and current position, renderables with unknown bounds
+        are always returned. Renderables which should not be rendered are skipped
+
+        :param engine.math.Rect area: Area in world coordinates
+        :return: List of renderables, in scene order
+        """
+        return [x for x in self._renderable_index.query(area, self) if x.should_render is True]
+
+    @property
+    def renderable_count(self):
+        """
+        Number of renderables known to the spatial index as of the last get_renderables_in_area call
+
+        :rtype: int
+        """
+        return len(self._renderable_index)
+
     def get_object_by_name(self, name):
         """
         Returns first found object with the specified name
         :param name: String name of the object, if None it will return first nameless object
         :return: Game object
         """
-        objs = self.get_objects_by_name(name)
-        return None if len(objs) == 0 else objs[0]
+        for obj in self._name_index.get(name):
+            if not obj.marked_for_deletion:
+                return obj
+        return None
 
     def get_objects_by_name(self, name):
         """
@@ -148,66 +360,124 @@ class Scene(object):
         :param None name: String name of the objects, None will return all nameless objects
         :return: List of game objects
         """
-        ret = []
-        for key, obj in self.objects.items():
-            if not obj.marked_for_deletion:
-                if obj.name == name:
-                    ret.append(obj)
-        return ret
+        return [obj for obj in self._name_index.get(name) if not obj.marked_for_deletion]
 
     def _add_awaiting_objects(self):
-        if len(self.objects_spawn_queue) > 0:
-            objects_list = enumerate(self.objects_spawn_queue)
-            for index, obj in objects_list:
-                if obj.id is not None or obj.scene is not None:
-                    del self.objects_spawn_queue[0:index+1]
-                    raise ObjectInScene(obj, "Queued object was added to another scene")
-
-                self.objects[self._maxIndex] = obj
-                obj.id = self._maxIndex
-                self._maxIndex += 1
-                obj.scene = self
-                obj.spawn()
-        del self.objects_spawn_queue[:]
+        # Objects spawned in this loop might queue further objects, those are created in the same frame
+        queue = self._spawn_queue
+        while len(queue) > 0:
+            _, obj = queue.popitem(last=False)
+            if obj.id is not None or obj.scene is not None:
+                raise ObjectInScene(obj, "Queued object was added to another scene")
+
+            self.objects[self._maxIndex] = obj
+            obj.id = self._maxIndex
+            self._maxIndex += 1
+            obj.scene = self
+            self._name_index.add(obj.name, obj)
+            self._on_components_added(obj, obj.components)
+            obj.spawn()
+
+    def _remove_spawned_object(self, obj):
+        del self.objects[obj.id]
+        for cmp in obj.components:
+            for cls in self._indexed_classes(cmp):
+                self._type_index.discard(cls, obj)
+        self._name_index.discard(obj.name, obj)
+        self._renderable_index.remove(obj)
+        self._remove_queue.append(obj)
+
+    def _on_components_added(self, obj, components):
+        """
+        Called by game objects in this scene whenever they receive new components
+        """
+        if self.objects.get(obj.id) is not obj:
+            return
+
+        for cmp in components:
+            for cls in self._indexed_classes(cmp):
+                self._type_index.add(cls, obj)
+        # A new transform moves renderables the object already has
+        if obj.get_component(Renderable) is not None:
+            self._renderable_index.mark(obj)
+
+    def _on_components_removed(self, obj, components):
+        """
+        Called by game objects in this scene whenever their components are removed
+        """
+        if self.objects.get(obj.id) is not obj:
+            return
+
+        for cmp in components:
+            for cls in self._indexed_classes(cmp):
+                if obj.get_component(cls) is None:
+                    self._type_index.discard(cls, obj)
+        if obj.get_component(Renderable) is not None or any(isinstance(x, Renderable) for x in components):
+            self._renderable_index.mark(obj)
+
+    def _on_object_moved(self, obj):
+        """
+        Called by game objects in this scene whenever their transform or image changes, so that renderable bounds are
+        updated
+        """
+        if obj.get_component(Renderable) is not None and self.objects.get(obj.id) is obj:
+            self._renderable_index.mark(obj)
+
+    def _on_object_renamed(self, obj, old_name):
+        """
+        Called by game objects in this scene whenever their name changes
+        """
+        if self.objects.get(obj.id) is not obj:
+            return
+
+        self._name_index.discard(old_name, obj)
+        self._name_index.add(obj.name, obj)
+
+    @staticmethod
+    def _indexed_classes(component):
+        return [cls for cls in type(component).__mro__ if cls is not object]
 
     def _check_collisions(self):
         checked = set()
         current_collisions = set()
         for pair in self._current_collisions:
-            checked.add((pair[0].game_object, pair[1].game_object))
-            checked.add((pair[1].game_object, pair[0].game_object))
-            if self._run_collision_check(pair[0], pair[1]):
+            checked.add((pair[0], pair[1]))
+            checked.add((pair[1], pair[0]))
+            if self._is_in_scene(pair[0]) and self._is_in_scene(pair[1]) and \
+                    self._run_collision_check(pair[0], pair[1]):
                 current_collisions.add(pair)
             else:
                 self._run_collision_for_pair(pair[0], pair[1], True)
 
         self._current_collisions = current_collisions
 
-        for obj1 in list(self.objects.values()):
-            collider1 = obj1.get_component(Collider)
-            if collider1 is not None:
-                for obj2 in list(self.objects.values()):
-                    if obj1 is not obj2 and (obj1, obj2) not in checked:
-                        collider2 = obj2.get_component(Collider)
-                        if collider2 is not None:
-                            checked.add((obj1, obj2))
-                            checked.add((obj2, obj1))
-                            if self._run_collision_check(collider1, collider2):
-                                self._run_collision_for_pair(collider1, collider2)
-                                self._current_collisions.add((collider1, collider2))
+        colliders = self.get_objects_of_type(Collider)
+        for collider1, collider2 in self.broadphase.find_pairs(colliders):
+            if (collider1, collider2) not in checked and self._run_collision_check(collider1, collider2):
+                self._run_collision_for_pair(collider1, collider2)
+                self._current_collisions.add((collider1, collider2))
 
     def _run_collision_for_pair(self, collider1, collider2, end=False):
-        for cmp in collider1.get_components():
-            if end:
-                cmp.end_collision(collider2.game_object)
-            else:
-                cmp.start_collision(collider2.game_object)
-
-        for cmp in collider2.get_components():
-            if end:
-                cmp.end_collision(collider1.game_object)
-            else:
-                cmp.start_collision(collider1.game_object)
+        obj1 = collider1.game_object
+        obj2 = collider2.game_object
+        for obj, other in ((obj1, obj2), (obj2, obj1)):
+            # Colliders detached from their objects while colliding only notify the other side
+            if obj is None:
+                continue
+
+            if self.profiler is not None:
+                self.profiler.run_components(obj, "end_collision" if end else "start_collision", other)
+                continue
+
+            for cmp in obj.get_components():
+                if end:
+                    cmp.end_collision(other)
+                else:
+                    cmp.start_collision(other)
+
+    def _is_in_scene(self, component):
+        obj = component.game_object
+        return obj is not None and self.objects.get(obj.id) is obj
 
     def _run_collision_check(self, collider1, collider2):
         return collider1.get_collision_shape().colliderect(collider2.get_collision_shape())
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+
+
+class SpatialHash(object):
+    """
+    Uniform grid which buckets items by the rectangles they cover, allowing to quickly find items near a given area.
+    Items are compared by identity, so they need to be hashable objects (components are a good fit)
+
+    :type cell_size: int
+    """
+    def __init__(self, cell_size=128):
+        if cell_size <= 0:
+            raise ValueError("Cell size has to be positive")
+
+        self.cell_size = cell_size
+        self._cells = {}
+        self._items = OrderedDict()
+        self._handles = {}
+        self._next_handle = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def clear(self):
+        """
+        Removes all items from the grid
+        """
+        self._cells.clear()
+        self._items.clear()
+        self._handles.clear()
+
+    def cells_for(self, rect):
+        """
+        Returns the range of cells covered by the rectangle
+
+        :param engine.math.Rect rect: Rectangle in world coordinates
+        :return: Tuple of (min x, min y, max x, max y) cell coordinates, inclusive
+        """
+        size = self.cell_size
+        return (int(rect.left // size), int(rect.top // size),
+                int(rect.right // size), int(rect.bottom // size))
+
+    def insert(self, item, rect):
+        """
+        Adds an item covering given rectangle, if the item is already in the grid it will be moved instead
+
+        :param item: Item to store
+        :param engine.math.Rect rect: Rectangle covered by the item
+        """
+        cells = self.cells_for(rect)
+        old_cells = self._items.get(item)
+        if old_cells == cells:
+            return
+
+        if old_cells is not None:
+            self._remove_from_cells(item, old_cells)
+        else:
+            self._handles[item] = self._next_handle
+            self._next_handle += 1
+
+        self._items[item] = cells
+        min_x, min_y, max_x, max_y = cells
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                bucket = self._cells.get((x, y))
+                if bucket is None:
+                    bucket = self._cells[(x, y)] = OrderedDict()
+                bucket[item] = None
+
+    update = insert
+
+    def remove(self, item):
+        """
+        Removes an item from the grid
+        Raises KeyError if the item is not in the grid
+
+        :param item: Item to remove
+        """
+        cells = self._items.pop(item)
+        del self._handles[item]
+        self._remove_from_cells(item, cells)
+
+    def query(self, rect):
+        """
+        Finds all items whose cells overlap cells of the rectangle. This is a conservative test, returned items
+        might not intersect the rectangle itself
+
+        :param engine.math.Rect rect: Rectangle in world coordinates
+        :return: List of unique items, in order they were first inserted
+        """
+        min_x, min_y, max_x, max_y = self.cells_for(rect)
+        found = {}
+        handles = self._handles
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                bucket = self._cells.get((x, y))
+                if bucket is not None:
+                    for item in bucket:
+                        found[item] = handles[item]
+
+        return sorted(found, key=found.get)
+
+    def pairs(self):
+        """
+        Finds all pairs of items which share at least one cell
+
+        :return: Set of (item1, item2) tuples, item1 always being inserted before item2
+        """
+        handles = self._handles
+        found = set()
+        for bucket in self._cells.values():
+            if len(bucket) < 2:
+                continue
+
+            items = sorted(bucket, key=handles.get)
+            for index, item1 in enumerate(items):
+                for item2 in items[index + 1:]:
+                    found.add((item1, item2))
+        return found
+
+    def _remove_from_cells(self, item, cells):
+        min_x, min_y, max_x, max_y = cells
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                bucket = self._cells[(x, y)]
+                del bucket[item]
+                if len(bucket) == 0:
+                    del self._cells[(x, y)]
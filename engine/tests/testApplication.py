@@ -0,0 +1,114 @@
+import os
+import unittest
+import pygame
+from engine import Application, Renderer, Scene, GameObject, components
+from engine.application import MissingSceneError
+
+
+class FrameCounter(components.BaseComponent):
+    def __init__(self):
+        super(FrameCounter, self).__init__()
+        self.frames = 0
+        self.postframes = 0
+
+    def update(self):
+        self.frames += 1
+
+    def update_postframe(self):
+        self.postframes += 1
+
+
+class TestHeadlessApplication(unittest.TestCase):
+    def setUp(self):
+        self.application = Application()
+        self.application.scene = Scene(self.application)
+        self.counter = FrameCounter()
+        self.application.scene.add_object(GameObject(self.counter))
+
+    def test_runs_given_number_of_frames(self):
+        self.assertEqual(100, self.application.run_headless(0.5, frames=100))
+        self.assertEqual(100, self.counter.frames)
+        self.assertAlmostEqual(50.0, self.application.scene.time)
+
+    def test_stops_on_condition(self):
+        frames = self.application.run_headless(0.1, stop_condition=lambda app: app.scene.time >= 1.0 - 1e-9)
+        self.assertEqual(10, frames)
+        self.assertEqual(10, self.counter.frames)
+
+    def test_requires_stop_criteria(self):
+        with self.assertRaises(ValueError):
+            self.application.run_headless(0.1)
+
+    def test_requires_scene(self):
+        with self.assertRaises(MissingSceneError):
+            Application().run_headless(0.1, frames=1)
+
+
+class SnapshotRecorder(Renderer):
+    def draw(self, snapshot):
+        super(SnapshotRecorder, self).draw(snapshot)
+        self.last_snapshot_time = snapshot.time
+
+
+class FailingComponent(components.BaseComponent):
+    def update(self):
+        raise RuntimeError("update failed")
+
+
+class TestPipelinedApplication(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        self.application = Application()
+        self.application.renderer = SnapshotRecorder(pygame.Surface((100, 100)))
+        self.application.scene = Scene(self.application)
+        self.counter = FrameCounter()
+        self.application.scene.add_object(GameObject(self.counter))
+        self.application.pipelined = True
+
+    def tearDown(self):
+        self.application._stop_simulation_worker()
+
+    def test_next_frame_is_simulated_while_drawing(self):
+        times = []
+        for frame in range(0, 3):
+            self.application._run_pipelined_frame(0.1, 0.1)
+            times.append(self.application.renderer.last_snapshot_time)
+        self.assertEqual(3, self.counter.frames)
+        # Every frame draws what was simulated during the previous one
+        self.assertEqual([0, 0.1, 0.2], [round(x, 6) for x in times])
+        self.assertTrue(self.application._postframe_pending)
+
+        self.application.run_headless(0.1, frames=1)
+        self.assertFalse(self.application._postframe_pending)
+        self.assertEqual(4, self.counter.frames)
+
+    def test_worker_thread_is_reused(self):
+        self.application._run_pipelined_frame(0.1, 0.1)
+        worker = self.application._simulation_worker
+        self.application._run_pipelined_frame(0.1, 0.1)
+        self.application._run_pipelined_frame(0.1, 0.1)
+        self.assertIs(worker, self.application._simulation_worker)
+        self.assertTrue(worker.thread.is_alive())
+        self.assertEqual(3, self.counter.frames)
+
+        self.application._stop_simulation_worker()
+        self.assertFalse(worker.thread.is_alive())
+        self.assertIsNone(self.application._simulation_worker)
+
+    def test_simulation_errors_are_raised(self):
+        self.application.scene.add_object(GameObject(FailingComponent()))
+        with self.assertRaises(RuntimeError):
+            self.application._run_pipelined_frame(0.1, 0.1)
+
+    def test_failed_frame_skips_postframe(self):
+        self.application._run_pipelined_frame(0.1, 0.1)
+        self.application.scene.add_object(GameObject(FailingComponent()))
+        with self.assertRaises(RuntimeError):
+            self.application._run_pipelined_frame(0.1, 0.1)
+        self.assertFalse(self.application._postframe_pending)
+        self.assertEqual(1, self.counter.postframes)
+
+        self.application._finish_postframe()
+        self.assertEqual(1, self.counter.postframes)
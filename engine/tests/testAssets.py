@@ -0,0 +1,47 @@
+import gc
+import os
+import unittest
+import pygame
+from engine import Assets
+from engine.interface import SpriteGroup
+
+HEART = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "interface", "heart.png")
+
+
+class TestAssets(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+    def setUp(self):
+        Assets.clear()
+
+    def test_images_are_shared(self):
+        first = Assets.load_image(HEART)
+        self.assertIs(first, Assets.load_image(os.path.abspath(HEART)))
+        self.assertEqual(1, len(Assets.memory_report()))
+
+    def test_images_are_converted(self):
+        surface = Assets.load_image(HEART)
+        self.assertEqual(pygame.display.get_surface().get_bitsize(), surface.get_bitsize())
+        self.assertTrue(Assets.memory_report()[0]["converted"])
+
+    def test_unused_images_are_evicted(self):
+        surface = Assets.load_image(HEART)
+        self.assertTrue(Assets.is_loaded(HEART))
+        del surface
+        gc.collect()
+        self.assertFalse(Assets.is_loaded(HEART))
+        self.assertEqual([], Assets.memory_report())
+
+    def test_memory_report(self):
+        surface = Assets.load_image(HEART)
+        report = Assets.memory_report()
+        self.assertEqual(surface.get_size(), report[0]["size"])
+        self.assertEqual(surface.get_pitch() * surface.get_height(), Assets.memory_usage())
+
+    def test_sprite_group_loads_image_once(self):
+        group = SpriteGroup("group", [(HEART, 8, 8)] * 3)
+        self.assertTrue(all(x[0] is group._images[0][0] for x in group._images))
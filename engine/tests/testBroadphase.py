@@ -0,0 +1,112 @@
+import unittest
+from engine import Scene, GameObject, components
+from engine.broadphase import BruteForceBroadphase, SpatialHashBroadphase
+from engine.math import Rect, Vector2
+from engine.spatial import SpatialHash
+
+
+class CollisionRecorder(components.BaseComponent):
+    def __init__(self, events):
+        super(CollisionRecorder, self).__init__()
+        self.events = events
+
+    def start_collision(self, obj):
+        self.events.append(("start", self.game_object.name, obj.name))
+
+    def end_collision(self, obj):
+        self.events.append(("end", self.game_object.name, obj.name))
+
+
+class TestSpatialHash(unittest.TestCase):
+    def test_query_returns_items_in_area(self):
+        grid = SpatialHash(10)
+        grid.insert("first", Rect(0, 0, 5, 5))
+        grid.insert("second", Rect(100, 100, 5, 5))
+        self.assertEqual(["first"], grid.query(Rect(0, 0, 8, 8)))
+        self.assertEqual(["second"], grid.query(Rect(95, 95, 8, 8)))
+
+    def test_update_moves_item(self):
+        grid = SpatialHash(10)
+        grid.insert("item", Rect(0, 0, 5, 5))
+        grid.update("item", Rect(100, 100, 5, 5))
+        self.assertEqual([], grid.query(Rect(0, 0, 8, 8)))
+        self.assertEqual(["item"], grid.query(Rect(100, 100, 1, 1)))
+        self.assertEqual(1, len(grid))
+
+    def test_remove(self):
+        grid = SpatialHash(10)
+        grid.insert("item", Rect(0, 0, 50, 50))
+        grid.remove("item")
+        self.assertEqual([], grid.query(Rect(0, 0, 50, 50)))
+        self.assertNotIn("item", grid)
+
+    def test_pairs_share_a_cell(self):
+        grid = SpatialHash(10)
+        grid.insert("first", Rect(0, 0, 5, 5))
+        grid.insert("second", Rect(2, 2, 5, 5))
+        grid.insert("third", Rect(500, 500, 5, 5))
+        self.assertSetEqual({("first", "second")}, grid.pairs())
+
+    def test_invalid_cell_size(self):
+        with self.assertRaises(ValueError):
+            SpatialHash(0)
+
+
+class TestSceneCollisions(unittest.TestCase):
+    def _create_scene(self, broadphase, positions):
+        events = []
+        scene = Scene(None, broadphase)
+        objects = []
+        for index, position in enumerate(positions):
+            obj = GameObject(components.Transform(position=Vector2(position)),
+                             components.StaticBoundingRectangle(10, 10),
+                             components.Collider(), CollisionRecorder(events))
+            obj.name = str(index)
+            objects.append(obj)
+            scene.add_object(obj)
+        scene.setup_frame(1.0)
+        return scene, objects, events
+
+    def _run_frame(self, scene):
+        scene.setup_frame(1.0)
+        scene.simulate_preframe()
+        scene.simulate_postframe()
+
+    def test_start_and_end_collision(self):
+        for broadphase in [BruteForceBroadphase(), SpatialHashBroadphase()]:
+            scene, objects, events = self._create_scene(broadphase, [(0, 0), (5, 5), (300, 300)])
+            self._run_frame(scene)
+            self.assertEqual([("start", "0", "1"), ("start", "1", "0")], events)
+
+            del events[:]
+            self._run_frame(scene)
+            self.assertEqual([], events)
+
+            objects[1].transform.position = Vector2(600, 600)
+            self._run_frame(scene)
+            self.assertEqual([("end", "0", "1"), ("end", "1", "0")], events)
+
+    def test_broadphases_report_same_collisions(self):
+        positions = [(x * 7 % 90, x * 13 % 50) for x in range(0, 60)]
+        brute_force_scene = self._create_scene(BruteForceBroadphase(), positions)
+        spatial_hash_scene = self._create_scene(SpatialHashBroadphase(16), positions)
+        self._run_frame(brute_force_scene[0])
+        self._run_frame(spatial_hash_scene[0])
+        self.assertTrue(len(brute_force_scene[2]) > 0)
+        self.assertEqual(brute_force_scene[2], spatial_hash_scene[2])
+
+    def test_spatial_hash_skips_distant_colliders(self):
+        broadphase = SpatialHashBroadphase(32)
+        scene, objects, events = self._create_scene(broadphase, [(0, 0), (1000, 1000), (2000, 0)])
+        colliders = scene.get_objects_of_type(components.Collider)
+        self.assertEqual([], list(broadphase.find_pairs(colliders)))
+
+    def test_destroyed_objects_end_collisions(self):
+        scene, objects, events = self._create_scene(SpatialHashBroadphase(), [(0, 0), (5, 5)])
+        self._run_frame(scene)
+        del events[:]
+
+        objects[1].destroy()
+        self._run_frame(scene)
+        self.assertEqual([("end", "0", "1"), ("end", "1", "0")], events)
+        self.assertEqual(set(), scene._current_collisions)
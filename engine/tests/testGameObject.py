@@ -77,6 +77,28 @@ class TestGameObjectComponents(unittest.TestCase):
         self.assertTrue(obj.has_component(engine.components.SpriteRenderer))
         self.assertTrue(obj.has_component(engine.components.BaseComponent))
 
+    def test_get_component_after_changes(self):
+        obj = GameObject()
+        self.assertIsNone(obj.get_component(engine.components.SpriteRenderer))
+        first = engine.components.SpriteRenderer()
+        second = engine.components.SpriteRenderer()
+        obj.add_components(first, second)
+        self.assertIs(first, obj.get_component(engine.components.SpriteRenderer))
+        self.assertIs(first, obj.get_component(engine.components.Renderable))
+        obj.remove_components(first)
+        self.assertIs(second, obj.get_component(engine.components.SpriteRenderer))
+        obj.remove_components(second)
+        self.assertIsNone(obj.get_component(engine.components.Renderable))
+
+    def test_transform_shortcut(self):
+        obj = GameObject()
+        self.assertIsNone(obj.transform)
+        transform = engine.components.Transform()
+        obj.add_components(engine.components.Camera(), transform)
+        self.assertIs(transform, obj.transform)
+        obj.remove_components(transform)
+        self.assertIsNone(obj.transform)
+
     def _test_remove_components(self, obj, count):
         import itertools
         components = list(obj.components)[0:count]
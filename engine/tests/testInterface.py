@@ -0,0 +1,79 @@
+import os
+import unittest
+import pygame
+from engine import Application, Renderer, Scene
+from engine.interface import Canvas, SpriteElement, UIElement
+
+HEART = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "interface", "heart.png")
+
+
+class TestRetainedInterface(unittest.TestCase):
+    def setUp(self):
+        application = Application()
+        application.renderer = Renderer(pygame.Surface((200, 100)))
+        self.scene = Scene(application)
+        self.renderer = application.renderer
+
+    def test_scaled_sprite_is_cached(self):
+        element = SpriteElement("heart", HEART, width=16, height=16)
+        surface = element.get_surface()
+        self.assertEqual((16, 16), surface.get_size())
+        self.assertIs(surface, element.get_surface())
+
+        element.width = 32
+        self.assertEqual((32, 16), element.get_surface().get_size())
+        element.sprite = pygame.Surface((32, 16))
+        self.assertIs(element.sprite, element.get_surface())
+
+    def test_children_list_is_cached(self):
+        canvas = Canvas(self.scene)
+        parent = UIElement("parent")
+        canvas.add_child(parent)
+        children = canvas.get_children()
+        self.assertIs(children, canvas.get_children())
+
+        child = UIElement("child")
+        parent.add_child(child)
+        self.assertEqual([parent, child], canvas.get_children())
+        parent.remove_child("child")
+        self.assertEqual([parent], canvas.get_children())
+
+    def test_composed_overlay_is_redrawn_only_when_dirty(self):
+        canvas = Canvas(self.scene, compose=True)
+        element = SpriteElement("block", None, width=10, height=10)
+        element.sprite = pygame.Surface((10, 10))
+        element.sprite.fill((255, 0, 0))
+        canvas.add_child(element)
+        self.scene.interface = canvas
+
+        self.renderer.render(self.scene)
+        self.assertFalse(canvas.dirty)
+        self.assertEqual((255, 0, 0, 255), tuple(self.renderer.screen.get_at((5, 5))))
+
+        # Changes not announced through the element are not picked up until it is marked dirty
+        element.sprite.fill((0, 255, 0))
+        self.renderer.render(self.scene)
+        self.assertEqual((255, 0, 0, 255), tuple(self.renderer.screen.get_at((5, 5))))
+
+        element.position = (50, 50)
+        self.assertTrue(canvas.dirty)
+        self.renderer.render(self.scene)
+        self.assertEqual((0, 255, 0, 255), tuple(self.renderer.screen.get_at((55, 55))))
+        self.assertEqual((0, 0, 0, 255), tuple(self.renderer.screen.get_at((5, 5))))
+
+    def test_captured_surfaces_are_not_affected_by_redraws(self):
+        canvas = Canvas(self.scene)
+        element = SpriteElement("bar", None, width=10, height=10)
+        element.sprite = pygame.Surface((10, 10))
+        element.sprite.fill((255, 0, 0))
+        canvas.add_child(element)
+        self.scene.interface = canvas
+
+        snapshot = self.renderer.capture(self.scene)
+        element.sprite.fill((0, 255, 0))
+        element.mark_dirty()
+        self.renderer.draw(snapshot)
+        self.assertEqual((255, 0, 0, 255), tuple(self.renderer.screen.get_at((5, 5))))
+
+        self.renderer.render(self.scene)
+        self.assertEqual((0, 255, 0, 255), tuple(self.renderer.screen.get_at((5, 5))))
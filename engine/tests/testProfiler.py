@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from engine import Application, Scene, GameObject, components
+from engine.profiler import Profiler
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        self.time += 0.001
+        return self.time
+
+
+class Updated(components.BaseComponent):
+    def __init__(self):
+        super(Updated, self).__init__()
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+
+
+class CountingObject(GameObject):
+    def __init__(self, *components):
+        super(CountingObject, self).__init__(*components)
+        self.updates = 0
+        self.postframe_updates = 0
+
+    def update(self):
+        super(CountingObject, self).update()
+        self.updates += 1
+
+    def update_postframe(self):
+        super(CountingObject, self).update_postframe()
+        self.postframe_updates += 1
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler(FakeClock())
+        self.application = Application()
+        self.application.scene = Scene(self.application)
+        self.application.profiler = self.profiler
+        self.component = Updated()
+        self.application.scene.add_object(GameObject(self.component, components.Transform()))
+
+    def test_records_phases_and_components(self):
+        self.application.run_headless(0.1, frames=10)
+
+        self.assertEqual(10, self.profiler.frames)
+        self.assertEqual(10, self.component.updates)
+        phases = self.profiler.phase_stats()
+        for phase in ["setup_frame", "collisions", "simulate_preframe", "simulate_postframe"]:
+            self.assertEqual(10, phases[phase]["calls"])
+        self.assertNotIn("render", phases)
+
+        stats = self.profiler.component_stats()
+        self.assertEqual(10, stats["Updated.update"]["calls"])
+        self.assertEqual(10, stats["Transform.update_postframe"]["calls"])
+        self.assertAlmostEqual(1.0, stats["Updated.update"]["mean_ms"])
+
+    def test_profiled_objects_run_their_own_updates(self):
+        component = Updated()
+        obj = CountingObject(component, components.Transform())
+        self.application.scene.add_object(obj)
+        self.application.run_headless(0.1, frames=5)
+
+        self.assertEqual(5, obj.updates)
+        self.assertEqual(5, obj.postframe_updates)
+        self.assertEqual(5, component.updates)
+        self.assertEqual(10, self.profiler.component_stats()["Updated.update"]["calls"])
+
+    def test_disabled_profiler_records_nothing(self):
+        self.application.profiler = None
+        self.application.run_headless(0.1, frames=10)
+        self.assertEqual(0, self.profiler.frames)
+        self.assertEqual({}, self.profiler.components)
+        self.assertIsNone(self.application.scene.profiler)
+
+    def test_summary_and_dumps(self):
+        self.application.run_headless(0.1, frames=3)
+        self.assertIn("Updated.update", self.profiler.summary())
+
+        directory = tempfile.mkdtemp()
+        json_path = os.path.join(directory, "profile.json")
+        csv_path = os.path.join(directory, "profile.csv")
+        self.profiler.dump_json(json_path)
+        self.profiler.dump_csv(csv_path)
+        with open(csv_path) as csv_file:
+            self.assertIn("component,Updated.update,3", csv_file.read())
+        os.remove(json_path)
+        os.remove(csv_path)
+        os.rmdir(directory)
+
+    def test_reset(self):
+        self.application.run_headless(0.1, frames=3)
+        self.profiler.reset()
+        self.assertEqual(0, self.profiler.frames)
+        self.assertEqual({}, self.profiler.component_stats())
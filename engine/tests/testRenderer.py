@@ -0,0 +1,340 @@
+import os
+import unittest
+import pygame
+from engine import Scene, GameObject, Renderer, components
+from engine.math import Rect, Vector2
+from engine.renderer import DynamicRenderScale, RenderQueue, TileChunks
+
+LEVEL = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "levels", "level01.tmx")
+
+
+class MapTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        cls.tiled_map = components.TiledMap(LEVEL)
+
+    def _create_scene(self, camera_position):
+        scene = Scene(None)
+        scene.add_object(GameObject(components.Transform(position=Vector2(0, 0)), self.tiled_map))
+        camera = GameObject(components.Transform(position=Vector2(camera_position)), components.Camera())
+        scene.add_object(camera)
+        scene.setup_frame(0)
+        scene.camera = camera
+        return scene
+
+
+class TestTileChunks(MapTestCase):
+    def test_chunks_in_area(self):
+        chunks = TileChunks(self.tiled_map.map, 512)
+        self.assertEqual([(0, 0)], chunks.chunks_in_area(Rect(0, 0, 512, 512)))
+        self.assertEqual([(0, 0), (1, 0), (0, 1), (1, 1)], chunks.chunks_in_area(Rect(500, 500, 20, 20)))
+        self.assertEqual([], chunks.chunks_in_area(Rect(-1000, -1000, 100, 100)))
+
+    def test_static_layers_are_grouped(self):
+        chunks = TileChunks(self.tiled_map.map, 512)
+        self.assertEqual([(True, list(self.tiled_map.map.visible_tile_layers))], chunks.groups)
+
+    def test_chunks_are_baked_once(self):
+        chunks = TileChunks(self.tiled_map.map, 256)
+        self.assertIs(chunks.get_chunk(0, 3, 3), chunks.get_chunk(0, 3, 3))
+
+    def test_least_recently_used_chunks_are_evicted(self):
+        chunks = TileChunks(self.tiled_map.map, 256)
+        chunk = chunks.get_chunk(0, 3, 6)
+        chunks = TileChunks(self.tiled_map.map, 256, max_bytes=chunk.get_pitch() * chunk.get_height() * 2)
+        chunks.get_chunk(0, 3, 6)
+        chunks.get_chunk(0, 4, 6)
+        chunks.get_chunk(0, 3, 6)
+        chunks.get_chunk(0, 5, 6)
+        self.assertEqual([(0, 3, 6), (0, 5, 6)], list(chunks._chunks))
+        self.assertEqual(1, chunks.evictions)
+        self.assertLessEqual(chunks.bytes, chunks.max_bytes)
+
+    def test_distant_chunks_are_discarded(self):
+        chunks = TileChunks(self.tiled_map.map, 256)
+        for x in range(0, 6):
+            chunks.get_chunk(0, x, 6)
+        chunks.discard_distant(Rect(256, 1536, 256, 256))
+        self.assertEqual([(0, 0, 6), (0, 1, 6), (0, 2, 6)], list(chunks._chunks))
+        self.assertEqual(3, chunks.evictions)
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            TileChunks(self.tiled_map.map, 0)
+
+    def test_render_draws_chunks_covering_screen(self):
+        scene = self._create_scene((2310, 1500))
+        renderer = Renderer(pygame.Surface((640, 480)), tile_chunk_size=128)
+        renderer.render(scene)
+        chunks = renderer._tile_chunks[self.tiled_map]
+        screen_area = Rect(2310 - 320, 1500 - 240, 640, 480)
+        self.assertEqual(set((0, x, y) for x, y in chunks.chunks_in_area(screen_area)), set(chunks._chunks))
+
+        renderer.invalidate_tiles(self.tiled_map)
+        self.assertNotIn(self.tiled_map, renderer._tile_chunks)
+
+    def test_chunks_left_behind_are_released(self):
+        renderer = Renderer(pygame.Surface((640, 480)), tile_chunk_size=128)
+        for x in range(320, 3200, 160):
+            renderer.render(self._create_scene((x, 1500)))
+        chunks = renderer._tile_chunks[self.tiled_map]
+        self.assertTrue(all(x >= (3200 - 160 - 320) // 128 - 1 for group, x, y in chunks._chunks))
+        self.assertTrue(chunks.evictions > 0)
+        self.assertEqual(sum(x[1] for x in chunks._chunks.values()), chunks.bytes)
+
+
+class TestTileModes(MapTestCase):
+    def test_culled_and_chunked_modes_draw_same_image(self):
+        scene = self._create_scene((2310.4, 1500.7))
+        culled = Renderer(pygame.Surface((640, 480)), tile_mode=Renderer.TILES_CULLED)
+        chunked = Renderer(pygame.Surface((640, 480)), tile_mode=Renderer.TILES_CHUNKED)
+        culled.render(scene)
+        chunked.render(scene)
+        self.assertEqual(pygame.image.tostring(culled.screen, "RGB"), pygame.image.tostring(chunked.screen, "RGB"))
+
+    def test_culled_mode_reads_changed_tiles(self):
+        scene = self._create_scene((2310, 1500))
+        renderer = Renderer(pygame.Surface((640, 480)), tile_mode=Renderer.TILES_CULLED)
+        renderer.render(scene)
+        before = pygame.image.tostring(renderer.screen, "RGB")
+
+        tile_map = self.tiled_map.map
+        layer = tile_map.layers[next(iter(tile_map.visible_tile_layers))]
+        row = layer.data[1500 // tile_map.tileheight]
+        column = 2310 // tile_map.tilewidth
+        original = row[column]
+        try:
+            row[column] = next(gid for gid, image in enumerate(tile_map.images) if image is not None and gid != original)
+            renderer.render(scene)
+            self.assertNotEqual(before, pygame.image.tostring(renderer.screen, "RGB"))
+        finally:
+            row[column] = original
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Renderer(pygame.Surface((1, 1)), tile_mode="fast")
+
+
+class TestDirtyRects(MapTestCase):
+    def _add_sprite(self, scene, position):
+        image = pygame.Surface((20, 20))
+        image.fill((255, 0, 0))
+        sprite = GameObject(components.Transform(position=Vector2(position)), components.SpriteRenderer(image=image))
+        scene.add_object(sprite)
+        scene.setup_frame(0)
+        return sprite
+
+    def test_only_changed_regions_are_redrawn(self):
+        scene = self._create_scene((2310.5, 1500))
+        sprite = self._add_sprite(scene, (2300, 1500))
+        dirty = Renderer(pygame.Surface((640, 480)), dirty_rects=True)
+        full = Renderer(pygame.Surface((640, 480)))
+
+        dirty.render(scene)
+        self.assertIsNone(dirty.update_rects)
+        dirty.render(scene)
+        self.assertEqual([], dirty.update_rects)
+
+        sprite.transform.position = Vector2(2350, 1520)
+        dirty.render(scene)
+        full.render(scene)
+        # Previous and current bounds of the sprite
+        self.assertEqual([(20, 20), (20, 20)], [x.size for x in dirty.update_rects])
+        self.assertEqual(pygame.image.tostring(full.screen, "RGB"), pygame.image.tostring(dirty.screen, "RGB"))
+
+        sprite.destroy()
+        scene.setup_frame(0)
+        scene.simulate_postframe()
+        dirty.render(scene)
+        full.render(scene)
+        self.assertEqual(1, len(dirty.update_rects))
+        self.assertEqual(pygame.image.tostring(full.screen, "RGB"), pygame.image.tostring(dirty.screen, "RGB"))
+
+    def test_camera_movement_redraws_everything(self):
+        scene = self._create_scene((2310, 1500))
+        renderer = Renderer(pygame.Surface((640, 480)), dirty_rects=True)
+        renderer.render(scene)
+        renderer.render(scene)
+        self.assertEqual([], renderer.update_rects)
+
+        scene.camera.transform.position = Vector2(2320, 1500)
+        renderer.render(scene)
+        self.assertIsNone(renderer.update_rects)
+
+
+class TestRenderQueue(unittest.TestCase):
+    def _surface(self, color):
+        surface = pygame.Surface((10, 10))
+        surface.fill(color)
+        return surface
+
+    def test_commands_are_drawn_by_layer(self):
+        queue = RenderQueue(batch_size=1)
+        target = pygame.Surface((10, 10))
+        queue.add(1, self._surface((255, 0, 0)), (0, 0))
+        queue.add(0, self._surface((0, 255, 0)), (0, 0))
+        queue.add(1, self._surface((0, 0, 255)), (5, 0))
+        self.assertEqual(3, len(queue))
+
+        queue.submit(target)
+        self.assertEqual((255, 0, 0, 255), tuple(target.get_at((2, 2))))
+        self.assertEqual((0, 0, 255, 255), tuple(target.get_at((7, 2))))
+        self.assertEqual(3, queue.issued)
+        self.assertEqual(0, len(queue))
+
+    def test_renderer_counts_culled_sprites(self):
+        scene = Scene(None)
+        for position in [(0, 0), (5000, 5000)]:
+            scene.add_object(GameObject(components.Transform(position=Vector2(position)),
+                                        components.SpriteRenderer(image=self._surface((255, 0, 0)))))
+        scene.setup_frame(0)
+
+        renderer = Renderer(pygame.Surface((100, 100)))
+        renderer.render(scene)
+        self.assertEqual(1, renderer.stats()["draw_calls"])
+        self.assertEqual(1, renderer.stats()["culled"])
+
+    def test_layers_override_scene_order(self):
+        scene = Scene(None)
+        top = components.SpriteRenderer(image=self._surface((255, 0, 0)))
+        top.layer = 1
+        scene.add_object(GameObject(components.Transform(), top))
+        scene.add_object(GameObject(components.Transform(), components.SpriteRenderer(image=self._surface((0, 255, 0)))))
+        scene.setup_frame(0)
+
+        renderer = Renderer(pygame.Surface((100, 100)))
+        renderer.render(scene)
+        self.assertEqual((255, 0, 0, 255), tuple(renderer.screen.get_at((50, 50))))
+
+
+class TestSpriteTransforms(unittest.TestCase):
+    def _render_sprite(self, rotation, horizontal_flip, vertical_flip):
+        image = pygame.Surface((30, 10))
+        image.fill((255, 0, 0))
+        image.fill((0, 255, 0), (0, 0, 10, 4))
+        sprite = components.SpriteRenderer(image=image, horizontal_flip=horizontal_flip, vertical_flip=vertical_flip)
+        scene = Scene(None)
+        scene.add_object(GameObject(components.Transform(position=Vector2(0, 0), rotation=rotation), sprite))
+        scene.setup_frame(0)
+
+        renderer = Renderer(pygame.Surface((100, 100)))
+        renderer.render(scene)
+
+        # Sprites used to be rotated and then flipped on every draw
+        expected = pygame.Surface((100, 100))
+        surface = pygame.transform.flip(pygame.transform.rotozoom(image, rotation, 1), horizontal_flip, vertical_flip)
+        expected.blit(surface, surface.get_rect(center=(50, 50)))
+        return renderer.screen, expected
+
+    def test_rotated_flipped_sprites_match_rotate_then_flip(self):
+        for rotation in [30, 90, 200]:
+            for horizontal_flip, vertical_flip in [(True, False), (False, True), (True, True)]:
+                screen, expected = self._render_sprite(rotation, horizontal_flip, vertical_flip)
+                self.assertEqual(pygame.image.tostring(expected, "RGB"), pygame.image.tostring(screen, "RGB"),
+                                 (rotation, horizontal_flip, vertical_flip))
+
+
+class TestRenderSnapshot(unittest.TestCase):
+    def test_snapshot_is_not_affected_by_simulation(self):
+        image = pygame.Surface((10, 10))
+        image.fill((255, 0, 0))
+        sprite = components.SpriteRenderer(image=image)
+        scene = Scene(None)
+        scene.add_object(GameObject(components.Transform(position=Vector2(20, 20)), sprite))
+        scene.setup_frame(0)
+
+        renderer = Renderer(pygame.Surface((100, 100)))
+        snapshot = renderer.capture(scene)
+        sprite.transform.position = Vector2(-30, -30)
+        sprite.image = None
+        renderer.draw(snapshot)
+        self.assertEqual((255, 0, 0, 255), tuple(renderer.screen.get_at((70, 70))))
+        self.assertEqual(1, renderer.stats()["draw_calls"])
+
+        renderer.render(scene)
+        self.assertEqual((0, 0, 0, 255), tuple(renderer.screen.get_at((70, 70))))
+        self.assertEqual(0, renderer.stats()["draw_calls"])
+
+
+class TestRenderScale(MapTestCase):
+    def test_render_scale_is_rounded(self):
+        self.assertEqual(0.6875, Renderer(pygame.Surface((10, 10)), render_scale=0.7).render_scale)
+        self.assertEqual(0.5, Renderer(pygame.Surface((10, 10)), render_scale=0.4,
+                                       upscale=Renderer.UPSCALE_INTEGER).render_scale)
+        with self.assertRaises(ValueError):
+            Renderer(pygame.Surface((10, 10)), render_scale=0)
+
+    def test_world_is_upscaled_to_screen(self):
+        image = pygame.Surface((10, 10))
+        image.fill((255, 0, 0))
+        scene = Scene(None)
+        scene.add_object(GameObject(components.Transform(position=Vector2(20, 20)),
+                                    components.SpriteRenderer(image=image)))
+        scene.setup_frame(0)
+
+        renderer = Renderer(pygame.Surface((100, 100)), render_scale=0.5, upscale=Renderer.UPSCALE_INTEGER)
+        renderer.render(scene)
+        self.assertEqual((50, 50), renderer.target.get_size())
+        self.assertEqual((255, 0, 0, 255), tuple(renderer.screen.get_at((66, 66))))
+        self.assertEqual((0, 0, 0, 255), tuple(renderer.screen.get_at((76, 76))))
+
+    def test_integer_upscale_is_letterboxed(self):
+        image = pygame.Surface((10, 10))
+        image.fill((255, 0, 0))
+        scene = Scene(None)
+        scene.add_object(GameObject(components.Transform(position=Vector2(3, 0)),
+                                    components.SpriteRenderer(image=image)))
+        scene.setup_frame(0)
+
+        renderer = Renderer(pygame.Surface((100, 50)), render_scale=1 / 3.0, upscale=Renderer.UPSCALE_INTEGER)
+        renderer.screen.fill((255, 255, 255))
+        renderer.render(scene)
+        self.assertEqual((33, 16), renderer.target.get_size())
+        area = Rect(0, 1, 99, 48)
+        expected = pygame.transform.scale(renderer.target, area.size)
+        self.assertEqual(pygame.image.tostring(expected, "RGB"),
+                         pygame.image.tostring(renderer.screen.subsurface(area), "RGB"))
+        self.assertEqual((0, 0, 0, 255), tuple(renderer.screen.get_at((99, 25))))
+        self.assertEqual((0, 0, 0, 255), tuple(renderer.screen.get_at((50, 0))))
+
+    def test_scaled_tile_modes_draw_same_image(self):
+        scene = self._create_scene((2300, 1500))
+        chunked = Renderer(pygame.Surface((640, 480)), render_scale=0.5, upscale=Renderer.UPSCALE_INTEGER)
+        culled = Renderer(pygame.Surface((640, 480)), tile_mode=Renderer.TILES_CULLED, render_scale=0.5,
+                          upscale=Renderer.UPSCALE_INTEGER)
+        chunked.render(scene)
+        culled.render(scene)
+        self.assertEqual((320, 240), chunked.target.get_size())
+        self.assertEqual(pygame.image.tostring(culled.target, "RGB"), pygame.image.tostring(chunked.target, "RGB"))
+
+
+class TestDynamicRenderScale(unittest.TestCase):
+    def test_scale_follows_render_time(self):
+        scaler = DynamicRenderScale(0.010, min_scale=0.5, step=0.25, smoothing=1.0, cooldown=2)
+        self.assertEqual(1.0, scaler.update(0.020, 1.0))
+        self.assertEqual(0.75, scaler.update(0.020, 1.0))
+        # Cost grows with the square of the scale, full scale would not fit the budget
+        self.assertEqual(0.75, scaler.update(0.008, 0.75))
+        self.assertEqual(0.75, scaler.update(0.008, 0.75))
+        self.assertEqual(0.5, scaler.update(0.030, 0.75))
+        self.assertEqual(0.5, scaler.update(0.030, 0.5))
+        self.assertEqual(0.5, scaler.update(0.030, 0.5))
+        self.assertEqual(0.75, scaler.update(0.001, 0.5))
+
+    def test_integer_scales(self):
+        scaler = DynamicRenderScale(0.010, min_scale=0.3, integer=True, smoothing=1.0, cooldown=1)
+        self.assertEqual(0.5, scaler.update(0.020, 1.0))
+        self.assertAlmostEqual(1 / 3.0, scaler.update(0.020, 0.5))
+        self.assertAlmostEqual(1 / 3.0, scaler.update(0.020, 1 / 3.0))
+        self.assertEqual(0.5, scaler.update(0.0001, 1 / 3.0))
+
+    def test_renderer_adjusts_scale(self):
+        renderer = Renderer(pygame.Surface((100, 100)), target_render_time=1e-9)
+        renderer.dynamic_scale.cooldown = 1
+        scene = Scene(None)
+        scene.setup_frame(0)
+        renderer.render(scene)
+        self.assertEqual(0.9375, renderer.stats()["render_scale"])
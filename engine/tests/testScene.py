@@ -1,5 +1,9 @@
+import gc
 import unittest
+import weakref
+import pygame
 from engine import Scene, GameObject, components
+from engine.math import Vector2, Rect
 from engine.scene import ObjectInScene
 
 
@@ -114,6 +118,7 @@ class TestSceneObjects(unittest.TestCase):
 
         self.assertIsNone(objects[0].scene)
         self.assertIsNone(objects[0].id)
+        self.assertEqual([], scene._remove_queue)
 
     def test_find_first_of_type(self):
         scene = Scene(None)
@@ -172,3 +177,187 @@ class TestSceneObjects(unittest.TestCase):
 
         self.assertIsNone(scene.get_object_of_type(components.Renderable))
         self.assertItemsEqual(scene.get_objects_of_type(components.Renderable), [])
+
+    def test_find_components_added_after_spawn(self):
+        scene = Scene(None)
+        first = GameObject()
+        second = GameObject(components.Camera())
+        scene.add_object(first)
+        scene.add_object(second)
+        scene.setup_frame(1.0)
+
+        camera = components.Camera()
+        first.add_components(camera)
+        self.assertIs(camera, scene.get_object_of_type(components.Camera))
+        self.assertEqual([camera, second.get_component(components.Camera)],
+                         scene.get_objects_of_type(components.Camera))
+
+    def test_find_components_by_base_class(self):
+        scene = Scene(None)
+        obj = GameObject(components.Transform(), components.SpriteRenderer())
+        scene.add_object(obj)
+        scene.setup_frame(1.0)
+
+        self.assertEqual([obj.get_component(components.SpriteRenderer)],
+                         scene.get_objects_of_type(components.Renderable))
+        self.assertEqual(1, len(scene.get_objects_of_type(components.BaseComponent)))
+
+    def test_removed_components_are_not_found(self):
+        scene = Scene(None)
+        first_camera = components.Camera()
+        second_camera = components.Camera()
+        obj = GameObject(first_camera, second_camera)
+        scene.add_object(obj)
+        scene.setup_frame(1.0)
+
+        obj.remove_components(first_camera)
+        self.assertEqual([second_camera], scene.get_objects_of_type(components.Camera))
+        obj.remove_components(second_camera)
+        self.assertEqual([], scene.get_objects_of_type(components.Camera))
+        self.assertIsNone(scene.get_object_of_type(components.Camera))
+
+    def test_removed_objects_are_not_found_by_type(self):
+        scene = Scene(None)
+        objects = [GameObject(components.Camera()) for x in range(0, 5)]
+        for obj in objects:
+            scene.add_object(obj)
+        scene.setup_frame(1.0)
+
+        scene.remove_object(objects[0])
+        objects[0].add_components(components.Camera())
+        self.assertEqual([x.get_component(components.Camera) for x in objects[1:]],
+                         scene.get_objects_of_type(components.Camera))
+
+    def test_return_renamed_object(self):
+        scene = Scene(None)
+        game_objects = [GameObject() for x in range(0, 3)]
+        for index, obj in enumerate(game_objects):
+            obj.name = str(index)
+            scene.add_object(obj)
+        scene.setup_frame(1.0)
+
+        game_objects[2].name = "0"
+        self.assertIsNone(scene.get_object_by_name("2"))
+        self.assertEqual([game_objects[0], game_objects[2]], scene.get_objects_by_name("0"))
+        game_objects[0].name = "renamed"
+        game_objects[0].name = "0"
+        self.assertEqual([game_objects[0], game_objects[2]], scene.get_objects_by_name("0"))
+
+    def test_removed_objects_are_not_found_by_name(self):
+        scene = Scene(None)
+        obj = GameObject()
+        obj.name = "removed"
+        scene.add_object(obj)
+        scene.setup_frame(1.0)
+
+        scene.remove_object(obj)
+        self.assertIsNone(scene.get_object_by_name("removed"))
+        obj.name = "renamed"
+        self.assertEqual([], scene.get_objects_by_name("renamed"))
+
+    def test_scene_adds_objects_in_bulk(self):
+        scene = Scene(None)
+        objects = [GameObject() for x in range(0, 100)]
+        scene.add_objects(objects)
+        self.assertEqual(objects, scene.objects_spawn_queue)
+        scene.setup_frame(1.0)
+        self.assertEqual(objects, list(scene.objects.values()))
+
+    def test_bulk_addition_is_rejected_as_a_whole(self):
+        scene = Scene(None)
+        queued = GameObject()
+        scene.add_object(queued)
+        with self.assertRaises(ObjectInScene):
+            scene.add_objects([GameObject(), queued])
+        with self.assertRaises(ObjectInScene):
+            obj = GameObject()
+            scene.add_objects([obj, obj])
+        self.assertEqual([queued], scene.objects_spawn_queue)
+
+    def test_scene_removes_objects_in_bulk(self):
+        scene = Scene(None)
+        objects = [GameObject() for x in range(0, 10)]
+        scene.add_objects(objects[:5])
+        scene.setup_frame(1.0)
+        scene.add_objects(objects[5:])
+        scene.remove_objects(objects[3:7])
+        scene.setup_frame(1.0)
+        self.assertEqual(objects[:3] + objects[7:], list(scene.objects.values()))
+        with self.assertRaises(ValueError):
+            scene.remove_objects([objects[0], objects[3]])
+        self.assertIn(objects[0], scene.objects.values())
+
+    def test_scene_readds_removed_queued_object(self):
+        scene = Scene(None)
+        first, second = GameObject(), GameObject()
+        scene.add_objects([first, second])
+        scene.remove_object(first)
+        scene.add_object(first)
+        self.assertEqual([second, first], scene.objects_spawn_queue)
+
+
+class TestSceneRenderables(unittest.TestCase):
+    def _create_sprite(self, scene, position, size=(10, 10)):
+        sprite = components.SpriteRenderer(image=pygame.Surface(size))
+        scene.add_object(GameObject(components.Transform(position=Vector2(position)), sprite))
+        return sprite
+
+    def test_renderables_in_area(self):
+        scene = Scene(None)
+        visible = self._create_sprite(scene, (50, 50))
+        self._create_sprite(scene, (5000, 5000))
+        unbounded = components.Renderable()
+        scene.add_object(GameObject(unbounded))
+        scene.setup_frame(0)
+
+        self.assertEqual([visible, unbounded], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+        self.assertEqual(3, scene.renderable_count)
+        visible.should_render = False
+        self.assertEqual([unbounded], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+
+    def test_moved_renderables_are_found(self):
+        scene = Scene(None)
+        first = self._create_sprite(scene, (5000, 5000))
+        second = self._create_sprite(scene, (50, 50))
+        scene.setup_frame(0)
+        scene.store_previous_transforms()
+        self.assertEqual([second], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+
+        first.transform.position = Vector2(20, 20)
+        second.transform.position = Vector2(5000, 5000)
+        self.assertEqual([first, second], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+        # Previous position is still covered until it is overwritten, interpolation can draw the sprite there
+        scene.store_previous_transforms()
+        self.assertEqual([first], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+
+    def test_resized_and_removed_renderables(self):
+        scene = Scene(None)
+        sprite = self._create_sprite(scene, (400, 400))
+        scene.setup_frame(0)
+        scene.store_previous_transforms()
+        self.assertEqual([], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+
+        sprite.image = pygame.Surface((700, 700))
+        self.assertEqual([sprite], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+        scene.remove_object(sprite.game_object)
+        self.assertEqual([], scene.get_renderables_in_area(Rect(0, 0, 100, 100)))
+        self.assertEqual(0, scene.renderable_count)
+
+    def test_destroyed_objects_are_collected_without_rendering(self):
+        scene = Scene(None)
+        references = []
+        for frame in range(0, 20):
+            objects = [GameObject(components.Transform(), components.SpriteRenderer(image=pygame.Surface((4, 4)))),
+                       GameObject(components.Transform())]
+            scene.add_objects(objects)
+            scene.setup_frame(0.1)
+            for obj in objects:
+                obj.transform.position = Vector2(frame, frame)
+                obj.destroy()
+                references.append(weakref.ref(obj))
+            scene.simulate_postframe()
+        del objects, obj
+
+        gc.collect()
+        self.assertEqual([], [x for x in references if x() is not None])
+        self.assertEqual(0, scene.renderable_count)
@@ -0,0 +1,102 @@
+import gc
+import os
+import unittest
+import weakref
+import pygame
+from engine import Scene, GameObject, components
+
+ANIMATIONS = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "spritesheets", "p1_anims.json")
+
+
+class TestSpriteAnimations(unittest.TestCase):
+    def setUp(self):
+        self.spritesheet = pygame.Surface((508, 288))
+
+    def _create_renderer(self, animation_data=ANIMATIONS):
+        return components.SpriteRenderer(image=self.spritesheet.subsurface((67, 196, 66, 92)),
+                                         animation_data=animation_data, default_animation="stand")
+
+    def test_animation_files_are_parsed_once(self):
+        first = self._create_renderer()
+        second = self._create_renderer()
+        self.assertIs(first.animations, second.animations)
+        self.assertEqual("player_animations", first.animation_set_name)
+
+    def test_shared_animations_are_read_only(self):
+        renderer = self._create_renderer()
+        with self.assertRaises(TypeError):
+            renderer.animations["walk"] = renderer.animations["stand"]
+        with self.assertRaises(TypeError):
+            components.SpriteRenderer().animations["walk"] = renderer.animations["stand"]
+
+    def test_frames_are_shared(self):
+        first = self._create_renderer()
+        second = self._create_renderer()
+        first.play_animation("walk", True)
+        second.play_animation("walk", True)
+        self.assertIs(first.image, second.image)
+        self.assertIs(self.spritesheet, first.image.get_parent())
+        self.assertEqual((0, 0), first.image.get_offset())
+
+    def test_frames_advance(self):
+        scene = Scene(None)
+        renderer = self._create_renderer()
+        scene.add_object(GameObject(components.Transform(), renderer))
+        renderer.play_animation("walk", True)
+        frames = renderer._animation_set.get_frames(self.spritesheet, "walk")
+
+        scene.setup_frame(1.0)
+        renderer.update()
+        self.assertIs(frames[1], renderer.image)
+
+    def test_frames_follow_spritesheet_of_image(self):
+        renderer = self._create_renderer()
+        renderer.play_animation("walk", True)
+        other_spritesheet = pygame.Surface((508, 288))
+        renderer.image = other_spritesheet.subsurface((67, 196, 66, 92))
+
+        renderer.play_animation("walk", True, restart=True)
+        self.assertIs(other_spritesheet, renderer.image.get_parent())
+        renderer.horizontal_flip = True
+        self.assertIs(renderer._animation_set.get_frames(other_spritesheet, "walk", True)[0],
+                      renderer.get_render_image())
+
+    def test_unused_frames_are_released(self):
+        spritesheet = pygame.Surface((508, 288))
+        renderer = components.SpriteRenderer(image=spritesheet.subsurface((67, 196, 66, 92)),
+                                             animation_data=ANIMATIONS, default_animation="stand")
+        renderer.horizontal_flip = True
+        renderer.play_animation("walk", True)
+        renderer.get_render_image()
+        animation_set = renderer._animation_set
+        spritesheet_reference = weakref.ref(spritesheet)
+
+        del spritesheet, renderer
+        gc.collect()
+        self.assertIsNone(spritesheet_reference())
+        self.assertEqual(0, len(animation_set._sheets))
+
+    def test_faulty_animation_data(self):
+        renderer = components.SpriteRenderer(animation_data={"name": "broken", "walk": {"frames": ["0 0 10"]}})
+        self.assertIsNone(renderer.animation_set_name)
+        self.assertEqual({}, renderer.animations)
+
+    def test_flipped_frames_are_shared(self):
+        first = self._create_renderer()
+        second = self._create_renderer()
+        first.horizontal_flip = True
+        second.horizontal_flip = True
+        first.play_animation("walk", True)
+        second.play_animation("walk", True)
+
+        flipped = first.get_render_image()
+        self.assertIs(flipped, second.get_render_image())
+        self.assertIsNot(first.image, flipped)
+        frames = first._animation_set.get_frames(self.spritesheet, "walk", True, False)
+        self.assertIs(frames[0], flipped)
+
+    def test_flipped_static_image_is_reused(self):
+        renderer = components.SpriteRenderer(image=pygame.Surface((4, 2)), vertical_flip=True)
+        self.assertIs(renderer.get_render_image(), renderer.get_render_image())
+        renderer.vertical_flip = False
+        self.assertIs(renderer.image, renderer.get_render_image())
@@ -0,0 +1,121 @@
+import os
+import unittest
+import pygame
+from engine import GameObject, components
+from engine.math import Rect, Vector2
+
+LEVEL = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "levels", "level01.tmx")
+
+
+class TestTiledMapQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        cls.tiled_map = components.TiledMap(LEVEL)
+        GameObject(components.Transform(position=Vector2(0, 0)), cls.tiled_map)
+
+    def _reference_tiles(self, left, top, right, bottom, **properties_values):
+        tiles = []
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                tile = self.tiled_map._get_tile_tuple(x, y)
+                if all(tile.properties.get(key) == value for key, value in properties_values.items()):
+                    tiles.append(tile)
+        return tiles
+
+    def test_filtered_query_matches_tile_by_tile_search(self):
+        tiled_map = self.tiled_map.map
+        area = Rect(0, 0, tiled_map.width * tiled_map.tilewidth, tiled_map.height * tiled_map.tileheight)
+        expected = self._reference_tiles(0, 0, tiled_map.width - 1, tiled_map.height - 1, collidable=True)
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(expected, self.tiled_map.get_tiles_for_area(area, collidable=True))
+        self.assertTrue(self.tiled_map.has_tiles_in_area(area, collidable=True))
+
+    def test_area_edges_are_exclusive(self):
+        tile_width = self.tiled_map.map.tilewidth
+        tile_height = self.tiled_map.map.tileheight
+        tiles = self.tiled_map.get_tiles_for_area(Rect(0, 0, tile_width * 2, tile_height))
+        self.assertEqual([(0, 0), (1, 0)], [(tile.x, tile.y) for tile in tiles])
+
+    def test_area_is_clamped_to_map(self):
+        tiled_map = self.tiled_map.map
+        area = Rect(0, 0, (tiled_map.width + 5) * tiled_map.tilewidth, (tiled_map.height + 5) * tiled_map.tileheight)
+        tiles = self.tiled_map.get_tiles_for_area(area)
+        self.assertEqual(tiled_map.width * tiled_map.height, len(tiles))
+
+    def test_area_outside_map(self):
+        area = Rect(-100, -100, 10, 10)
+        self.assertEqual([], self.tiled_map.get_tiles_for_area(area, collidable=True))
+        self.assertFalse(self.tiled_map.has_tiles_in_area(area, collidable=True))
+
+    def test_missing_property(self):
+        area = Rect(0, 0, 500, 500)
+        self.assertEqual([], self.tiled_map.get_tiles_for_area(area, does_not_exist=True))
+        self.assertFalse(self.tiled_map.has_tiles_in_area(area, "does_not_exist"))
+
+    def test_tiles_are_shared(self):
+        tiled_map = self.tiled_map.map
+        area = Rect(0, 0, tiled_map.width * tiled_map.tilewidth, tiled_map.height * tiled_map.tileheight)
+        first = self.tiled_map.get_tiles_for_area(area, collidable=True)
+        second = self.tiled_map.get_tiles_for_area(area, collidable=True)
+        self.assertTrue(len(first) > 0)
+        self.assertTrue(all(a is b for a, b in zip(first, second)))
+        with self.assertRaises(TypeError):
+            first[0].properties["collidable"] = False
+
+
+class TestTiledMapEdits(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        self.tiled_map = components.TiledMap(LEVEL)
+        GameObject(components.Transform(position=Vector2(0, 0)), self.tiled_map)
+        tiled_map = self.tiled_map.map
+        self.area = Rect(0, 0, tiled_map.width * tiled_map.tilewidth, tiled_map.height * tiled_map.tileheight)
+        self.ground = next(x for x in tiled_map.layers if x.properties.get("collidable"))
+
+    def _tile_area(self, x, y):
+        return Rect(x * self.tiled_map.map.tilewidth, y * self.tiled_map.map.tileheight,
+                    self.tiled_map.map.tilewidth, self.tiled_map.map.tileheight)
+
+    def test_grid_is_built_when_map_is_assigned(self):
+        grid = self.tiled_map.tile_grid
+        self.assertIsNotNone(grid)
+        self.assertIs(self.tiled_map.map, grid.map)
+        self.assertEqual([{}, {"collidable": True}], grid.layer_properties)
+
+        self.tiled_map.map = None
+        self.assertIsNone(self.tiled_map.tile_grid)
+
+    def test_changed_layer_properties_are_parsed_again(self):
+        self.ground.properties["slippery"] = "true"
+        self.tiled_map.invalidate()
+        tiles = self.tiled_map.get_tiles_for_area(self.area, slippery=True)
+        self.assertTrue(len(tiles) > 0)
+        self.assertIs(True, tiles[0].properties["slippery"])
+
+        del self.ground.properties["slippery"]
+        self.tiled_map.invalidate()
+        self.assertEqual([], self.tiled_map.get_tiles_for_area(self.area, slippery=True))
+
+    def test_changed_tiles_are_picked_up(self):
+        x, y = next((x, y) for y, row in enumerate(self.ground.data) for x, gid in enumerate(row) if gid)
+        self.assertTrue(self.tiled_map.has_tiles_in_area(self._tile_area(x, y), collidable=True))
+
+        self.ground.data[y][x] = 0
+        self.tiled_map.invalidate()
+        self.assertFalse(self.tiled_map.has_tiles_in_area(self._tile_area(x, y), collidable=True))
+        self.assertEqual({}, dict(self.tiled_map._get_tile_tuple(x, y).properties))
+
+    def test_shown_layer_is_picked_up(self):
+        self.ground.visible = False
+        self.tiled_map.invalidate()
+        self.assertFalse(self.tiled_map.has_tiles_in_area(self.area, collidable=True))
+
+        self.ground.visible = True
+        self.tiled_map.invalidate()
+        self.assertTrue(self.tiled_map.has_tiles_in_area(self.area, collidable=True))
+        self.assertTrue(len(self.tiled_map.get_tiles_for_area(self.area, collidable=True)) > 0)
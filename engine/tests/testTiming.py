@@ -0,0 +1,137 @@
+import unittest
+from engine import components
+from engine.math import Vector2
+from engine.timing import FixedTimestep, FramePacer, FrameTimeHistogram
+
+
+class TestFixedTimestep(unittest.TestCase):
+    def test_splits_time_into_ticks(self):
+        timestep = FixedTimestep(tick_rate=10)
+        self.assertEqual(0, timestep.advance(0.05))
+        self.assertAlmostEqual(0.5, timestep.alpha)
+        self.assertEqual(1, timestep.advance(0.05))
+        self.assertEqual(3, timestep.advance(0.3))
+        self.assertAlmostEqual(0.0, timestep.accumulator)
+
+    def test_exact_frames_produce_a_tick_each(self):
+        timestep = FixedTimestep(tick_rate=60)
+        self.assertEqual([1] * 600, [timestep.advance(1.0 / 60) for x in range(0, 600)])
+
+    def test_drops_time_above_max_ticks(self):
+        timestep = FixedTimestep(tick_rate=10, max_ticks=3)
+        self.assertEqual(3, timestep.advance(1.05))
+        self.assertAlmostEqual(0.7, timestep.dropped_time)
+        self.assertAlmostEqual(0.5, timestep.alpha)
+        self.assertEqual(0, timestep.advance(0.0))
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            FixedTimestep(tick_rate=0)
+        with self.assertRaises(ValueError):
+            FixedTimestep(max_ticks=0)
+
+
+class TestTransformInterpolation(unittest.TestCase):
+    def test_interpolates_between_previous_and_current_state(self):
+        transform = components.Transform(position=Vector2(0, 0), rotation=0)
+        self.assertEqual(Vector2(0, 0), transform.interpolated_position(0.5))
+
+        transform.store_previous()
+        transform.position = Vector2(10, 20)
+        transform.rotation = 90
+        self.assertEqual(Vector2(5, 10), transform.interpolated_position(0.5))
+        self.assertEqual(45, transform.interpolated_rotation(0.5))
+        self.assertEqual(Vector2(10, 20), transform.interpolated_position(1.0))
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.time = 0.0
+        self.slept = []
+
+    def __call__(self):
+        # Busy-waiting moves time forward as well
+        self.time += 0.0001
+        return self.time
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.time += seconds
+
+
+class TestFrameTimeHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = FrameTimeHistogram(bucket_width=0.001)
+        for x in range(0, 98):
+            histogram.add(0.0155)
+        histogram.add(0.0305)
+        histogram.add(0.0505)
+        self.assertAlmostEqual(0.016, histogram.percentile(50))
+        self.assertAlmostEqual(0.016, histogram.percentile(95))
+        self.assertAlmostEqual(0.031, histogram.percentile(99))
+        self.assertAlmostEqual(0.051, histogram.percentile(100))
+        self.assertAlmostEqual(0.0505, histogram.max())
+
+    def test_long_and_dropped_frames(self):
+        histogram = FrameTimeHistogram(target_frame_time=0.01)
+        histogram.add(0.01)
+        histogram.add(0.014)
+        histogram.add(0.016)
+        histogram.add(0.035)
+        # Frames lasting 1.6 targets are long but drop nothing, 3.5 targets drop two
+        self.assertEqual(2, histogram.long_frames)
+        self.assertEqual(2, histogram.dropped_frames)
+        self.assertEqual(2, histogram.stats()["dropped_frames"])
+
+    def test_window_rolls(self):
+        histogram = FrameTimeHistogram(target_frame_time=0.01, window=2)
+        histogram.add(0.05)
+        histogram.add(0.01)
+        histogram.add(0.01)
+        self.assertEqual(2, len(histogram))
+        self.assertEqual(0, histogram.long_frames)
+        self.assertEqual(0, histogram.dropped_frames)
+        self.assertAlmostEqual(0.01, histogram.mean())
+        self.assertAlmostEqual(0.01, histogram.max())
+
+    def test_frames_above_max_time(self):
+        histogram = FrameTimeHistogram(max_time=0.1)
+        histogram.add(0.5)
+        self.assertAlmostEqual(0.5, histogram.percentile(50))
+        histogram.reset()
+        self.assertEqual(0.0, histogram.percentile(50))
+
+
+class TestFramePacer(unittest.TestCase):
+    def test_uncapped_frames_do_not_wait(self):
+        clock = FakeClock()
+        pacer = FramePacer(clock=clock, sleep=clock.sleep)
+        self.assertEqual(0.0, pacer.wait())
+        clock.time += 0.02
+        self.assertAlmostEqual(0.0201, pacer.wait())
+        self.assertEqual([], clock.slept)
+        self.assertEqual(1, len(pacer.histogram))
+
+    def test_cap_sleeps_and_spins_until_deadline(self):
+        clock = FakeClock()
+        pacer = FramePacer(max_fps=50, spin_time=0.002, clock=clock, sleep=clock.sleep)
+        pacer.wait()
+        for frame in range(0, 5):
+            clock.time += 0.005
+            self.assertAlmostEqual(0.02, pacer.wait(), places=3)
+        self.assertTrue(all(0.012 < x < 0.013 for x in clock.slept))
+        self.assertEqual(0, pacer.histogram.dropped_frames)
+
+    def test_late_frames_are_not_caught_up(self):
+        clock = FakeClock()
+        pacer = FramePacer(max_fps=50, clock=clock, sleep=clock.sleep)
+        pacer.wait()
+        clock.time += 0.1
+        self.assertAlmostEqual(0.1, pacer.wait(), places=3)
+        clock.time += 0.005
+        self.assertAlmostEqual(0.02, pacer.wait(), places=3)
+        self.assertEqual(4, pacer.histogram.dropped_frames)
+
+    def test_invalid_cap(self):
+        with self.assertRaises(ValueError):
+            FramePacer(max_fps=0)
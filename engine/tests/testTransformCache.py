@@ -0,0 +1,53 @@
+import unittest
+import pygame
+from engine.transformcache import TransformCache
+
+
+class TestTransformCache(unittest.TestCase):
+    def setUp(self):
+        self.surface = pygame.Surface((10, 10), pygame.SRCALPHA)
+
+    def test_untransformed_surface_is_returned_as_is(self):
+        cache = TransformCache()
+        self.assertIs(self.surface, cache.get(self.surface))
+        self.assertIs(self.surface, cache.get(self.surface, 360, 1))
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.misses)
+
+    def test_transformed_surfaces_are_reused(self):
+        cache = TransformCache()
+        rotated = cache.get(self.surface, 45, 1)
+        self.assertIs(rotated, cache.get(self.surface, 45, 1))
+        self.assertIsNot(rotated, cache.get(self.surface, 45, 1, horizontal_flip=True))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+    def test_flip_and_scale(self):
+        cache = TransformCache()
+        self.assertEqual((20, 20), cache.get(self.surface, 0, 2).get_size())
+        self.assertEqual((10, 10), cache.get(self.surface, 0, 1, vertical_flip=True).get_size())
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        entry_size = pygame.transform.flip(self.surface, True, False).get_pitch() * 10
+        cache = TransformCache(entry_size * 2)
+        first = pygame.Surface((10, 10), pygame.SRCALPHA)
+        second = pygame.Surface((10, 10), pygame.SRCALPHA)
+        third = pygame.Surface((10, 10), pygame.SRCALPHA)
+        cache.get(first, horizontal_flip=True)
+        cache.get(second, horizontal_flip=True)
+        cache.get(first, horizontal_flip=True)
+        cache.get(third, horizontal_flip=True)
+
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual(2, len(cache))
+        self.assertEqual(entry_size * 2, cache.bytes)
+        cache.get(first, horizontal_flip=True)
+        self.assertEqual(2, cache.hits)
+
+        cache.resize(0)
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.stats()["bytes"])
+
+    def test_invalid_cap(self):
+        with self.assertRaises(ValueError):
+            TransformCache(-1)
@@ -3,7 +3,15 @@ __author__ = 'Maverick'
 from pytmx.util_pygame import handle_transformation, smart_convert
 from pytmx import TiledMap
 import pygame
+from collections import namedtuple
+from types import MappingProxyType
 import logging
+import ast
+import numpy
+
+Tile = namedtuple("Tile", ['x', 'y', 'properties'])
+
+EMPTY_PROPERTIES = MappingProxyType({})
 
 
 def image_loader(filename, colorkey, **kwargs):
@@ -33,4 +41,158 @@ def image_loader(filename, colorkey, **kwargs):
 
 def load(filename, *args, **kwargs):
     kwargs["image_loader"] = image_loader
-    return TiledMap(filename, *args, **kwargs)
\ No newline at end of file
+    return TiledMap(filename, *args, **kwargs)
+
+
+def parse_properties(properties):
+    """
+    Converts string values of Tiled properties into python literals where possible, "true"/"false" become booleans
+
+    :param dict properties: Raw properties
+    :return dict: Parsed properties
+    """
+    parsed = dict()
+    for key, value in properties.items():
+        try:
+            if value in ["true", "false"]:
+                value = value.title()
+            parsed[key] = ast.literal_eval(value)
+        except (SyntaxError, ValueError) as e:
+            parsed[key] = value
+    return parsed
+
+
+class TileGrid(object):
+    """
+    Per tile lookup tables of a map's visible tile layers, built once so that area queries can slice arrays
+    instead of visiting every tile. Property lookups follow layer order, if several layers define a property
+    at a tile the value from the topmost one is used. Tables are a snapshot of the map when the grid was built,
+    changes of tiles, layer visibility or layer properties are only picked up by a new grid.
+
+    Tile records and their properties are flyweights: tiles covered by the same set of layers share one read-only
+    properties mapping and every tile record is created only once, so they must not be modified
+
+    :type map: pytmx.TiledMap
+    :type width: int
+    :type height: int
+    :type layers: list
+    :type gids: numpy.ndarray
+    :type layer_properties: list
+    """
+    def __init__(self, tiled_map):
+        """
+        :param pytmx.TiledMap tiled_map: Loaded map
+        """
+        self.map = tiled_map
+        self.width = tiled_map.width
+        self.height = tiled_map.height
+        self.layers = list(tiled_map.visible_tile_layers)
+        # Value table: gid of every tile, indexed by [visible layer, y, x]
+        self.gids = numpy.zeros((len(self.layers), self.height, self.width), dtype=numpy.uint32)
+        for index, layer in enumerate(self.layers):
+            self.gids[index] = numpy.array(tiled_map.layers[layer].data, dtype=numpy.uint32).reshape(
+                (self.height, self.width))
+        self.layer_properties = [parse_properties(tiled_map.layers[x].properties) for x in self.layers]
+        # Merged properties keyed by which layers cover a tile
+        self._merged_properties = {}
+        self._tiles = {}
+
+        # For every property, index of the visible layer whose value applies at a tile, -1 if none does
+        self._owners = {}
+        for index, properties in enumerate(self.layer_properties):
+            occupied = self.gids[index] != 0
+            for key in properties:
+                owner = self._owners.get(key)
+                if owner is None:
+                    owner = self._owners[key] = numpy.full((self.height, self.width), -1, dtype=numpy.int16)
+                owner[occupied] = index
+
+        self._masks = {}
+
+    def get_tile(self, x, y):
+        """
+        Returns the shared tile record at given coordinates, tiles out of map bounds have no properties
+
+        :param int x: Tile column
+        :param int y: Tile row
+        :rtype: Tile
+        """
+        key = (x, y)
+        tile = self._tiles.get(key)
+        if tile is None:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                tile = self._tiles[key] = Tile(x=x, y=y, properties=self._get_properties(x, y))
+            else:
+                tile = Tile(x=x, y=y, properties=EMPTY_PROPERTIES)
+        return tile
+
+    def _get_properties(self, x, y):
+        covering = tuple(self.gids[:, y, x] != 0)
+        properties = self._merged_properties.get(covering)
+        if properties is None:
+            merged = dict()
+            for index, covered in enumerate(covering):
+                if covered:
+                    merged.update(self.layer_properties[index])
+            properties = self._merged_properties[covering] = MappingProxyType(merged) if merged else EMPTY_PROPERTIES
+        return properties
+
+    def property_mask(self, key, *value):
+        """
+        Returns a boolean grid of tiles which have the property, optionally set to the given value
+
+        :param str key: Name of the property
+        :param value: If given, only tiles whose property equals this value are marked
+        :rtype: numpy.ndarray
+        """
+        cache_key = (key,) + value
+        try:
+            return self._masks[cache_key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable values are not cached
+            cache_key = None
+
+        owner = self._owners.get(key)
+        mask = numpy.zeros((self.height, self.width), dtype=bool)
+        if owner is not None:
+            if len(value) == 0:
+                mask = owner >= 0
+            else:
+                for index, properties in enumerate(self.layer_properties):
+                    if key in properties and properties[key] == value[0]:
+                        mask |= owner == index
+
+        if cache_key is not None:
+            self._masks[cache_key] = mask
+        return mask
+
+    def area_mask(self, left, top, right, bottom, properties=(), properties_values=None):
+        """
+        Returns a boolean array of tiles within the area which match all filters, indexed [y - top, x - left].
+        Area has to lie within the map
+
+        :param int left: First tile column
+        :param int top: First tile row
+        :param int right: Last tile column, inclusive
+        :param int bottom: Last tile row, inclusive
+        :param properties: Properties tiles must possess
+        :param dict properties_values: Properties and values tiles must have
+        :rtype: numpy.ndarray
+        """
+        window = (slice(top, bottom + 1), slice(left, right + 1))
+        mask = None
+        for key in properties:
+            mask = self._combine(mask, self.property_mask(key)[window])
+        if properties_values:
+            for key, value in properties_values.items():
+                mask = self._combine(mask, self.property_mask(key, value)[window])
+
+        if mask is None:
+            mask = numpy.ones((max(bottom - top + 1, 0), max(right - left + 1, 0)), dtype=bool)
+        return mask
+
+    @staticmethod
+    def _combine(mask, other):
+        return other if mask is None else mask & other
@@ -0,0 +1,277 @@
+from collections import deque
+from timeit import default_timer
+import time
+
+
+class FixedTimestep(object):
+    """
+    Accumulates real frame time and splits it into simulation ticks of a constant length. If the simulation falls
+    too far behind, the time above max_ticks per frame is dropped instead of being caught up on, which would only
+    make the next frame take longer
+
+    :type tick_rate: float
+    :type max_ticks: int
+    :type accumulator: float
+    :type dropped_time: float
+    """
+    def __init__(self, tick_rate=60, max_ticks=5):
+        """
+        :param float tick_rate: Simulation ticks per second
+        :param int max_ticks: Maximum number of ticks simulated during a single frame
+        """
+        if tick_rate <= 0:
+            raise ValueError("Tick rate has to be positive")
+        if max_ticks < 1:
+            raise ValueError("At least one tick per frame has to be allowed")
+
+        self.tick_rate = tick_rate
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.dropped_time = 0.0
+
+    @property
+    def dt(self):
+        """
+        Length of a single tick in seconds
+        """
+        return 1.0 / self.tick_rate
+
+    @property
+    def alpha(self):
+        """
+        How far, in 0-1 range, real time is between the last simulated tick and the next one. Used to interpolate
+        rendered state between the two last ticks
+        """
+        return min(self.accumulator / self.dt, 1.0)
+
+    def advance(self, frame_time):
+        """
+        Adds real time which passed since the last frame
+
+        :param float frame_time: Time in seconds
+        :return int: Number of ticks which should be simulated this frame
+        """
+        dt = self.dt
+        self.accumulator += frame_time
+        # Tolerate rounding errors so that frames exactly one tick long always produce a tick
+        ticks = int(self.accumulator / dt + 1e-9)
+        if ticks > self.max_ticks:
+            self.dropped_time += (ticks - self.max_ticks) * dt
+            ticks = self.max_ticks
+            self.accumulator = ticks * dt + self.accumulator % dt
+
+        self.accumulator = max(self.accumulator - ticks * dt, 0.0)
+        return ticks
+
+    def reset(self):
+        """
+        Discards any accumulated time, should be used after long pauses (e.g. loading)
+        """
+        self.accumulator = 0.0
+
+
+class FrameTimeHistogram(object):
+    """
+    Rolling histogram of real frame times over the last frames, used to find hitches which an average hides.
+    Frames longer than long_frame_factor times the target frame time are counted as long, every whole target frame
+    time a frame took beyond the first one is counted as a dropped frame
+
+    :type target_frame_time: float
+    :type window: int
+    :type bucket_width: float
+    :type long_frame_factor: float
+    :type long_frames: int
+    :type dropped_frames: int
+    """
+    def __init__(self, target_frame_time=1 / 60.0, window=600, bucket_width=0.0005, max_time=0.25,
+                 long_frame_factor=1.5):
+        """
+        :param float target_frame_time: Frame time in seconds frames are expected to take when no cap is given
+        :param int window: Number of most recent frames kept
+        :param float bucket_width: Width of a bucket in seconds, percentiles are as precise as this
+        :param float max_time: Frames longer than this many seconds share the last bucket
+        :param float long_frame_factor: Frames longer than target frame time multiplied by this are long
+        """
+        if window < 1:
+            raise ValueError("Window has to hold at least one frame")
+        if bucket_width <= 0 or max_time <= 0:
+            raise ValueError("Bucket width and maximum time have to be positive")
+
+        self.target_frame_time = target_frame_time
+        self.window = window
+        self.bucket_width = bucket_width
+        self.long_frame_factor = long_frame_factor
+        self.long_frames = 0
+        self.dropped_frames = 0
+        self._buckets = [0] * (int(max_time / bucket_width) + 1)
+        # Tuples of frame time, bucket, whether the frame was long and how many frames it dropped
+        self._frames = deque()
+        self._total = 0.0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def add(self, frame_time, target_frame_time=None):
+        """
+        :param float frame_time: Real time in seconds the frame took
+        :param float target_frame_time: Time the frame was supposed to take, target_frame_time if None
+        """
+        if target_frame_time is None:
+            target_frame_time = self.target_frame_time
+        if len(self._frames) >= self.window:
+            self._remove_oldest()
+
+        bucket = min(int(frame_time / self.bucket_width), len(self._buckets) - 1)
+        long_frame = frame_time > target_frame_time * self.long_frame_factor
+        # Tolerate rounding errors, so that frames lasting exactly the target time drop nothing
+        dropped = max(int(frame_time / target_frame_time + 1e-9) - 1, 0)
+        self._buckets[bucket] += 1
+        self._frames.append((frame_time, bucket, long_frame, dropped))
+        self._total += frame_time
+        self.long_frames += long_frame
+        self.dropped_frames += dropped
+
+    def percentile(self, percent):
+        """
+        :param float percent: Percentage of frames, 0-100
+        :return: Frame time in seconds which percent of frames did not exceed, rounded up to the bucket width.
+                 Frames in the last bucket are represented by the longest one
+        """
+        if len(self._frames) == 0:
+            return 0.0
+
+        needed = max(percent / 100.0 * len(self._frames), 1)
+        count = 0
+        for bucket, frames in enumerate(self._buckets):
+            count += frames
+            if count >= needed - 1e-9:
+                if bucket == len(self._buckets) - 1:
+                    return self.max()
+                return (bucket + 1) * self.bucket_width
+        return self.max()
+
+    def mean(self, last=None):
+        """
+        :param int last: Averages only this many most recent frames if set
+        :return: Mean frame time in seconds
+        """
+        if len(self._frames) == 0:
+            return 0.0
+        if last is None or last >= len(self._frames):
+            return self._total / len(self._frames)
+
+        frames = [self._frames[-x][0] for x in range(1, last + 1)]
+        return sum(frames) / len(frames)
+
+    def max(self):
+        """
+        :return: Longest frame time in seconds
+        """
+        return max(x[0] for x in self._frames) if len(self._frames) > 0 else 0.0
+
+    def reset(self):
+        """
+        Forgets all frames
+        """
+        self._buckets = [0] * len(self._buckets)
+        self._frames.clear()
+        self._total = 0.0
+        self.long_frames = 0
+        self.dropped_frames = 0
+
+    def stats(self):
+        """
+        :return: Dictionary with frame count, mean, percentiles and max in milliseconds and long and dropped frame
+                 counts
+        """
+        return {
+            "frames": len(self._frames),
+            "mean_ms": self.mean() * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max() * 1000,
+            "long_frames": self.long_frames,
+            "dropped_frames": self.dropped_frames,
+        }
+
+    def summary(self):
+        """
+        :return: Single line describing frame times, for the log
+        :rtype: str
+        """
+        stats = self.stats()
+        fps = 1000.0 / stats["mean_ms"] if stats["mean_ms"] > 0 else 0.0
+        return ("Frame time over {frames} frames: FPS {fps:.1f}, p50 {p50_ms:.2f}ms, p95 {p95_ms:.2f}ms, "
+                "p99 {p99_ms:.2f}ms, max {max_ms:.2f}ms, {long_frames} long, {dropped_frames} dropped").format(
+            fps=fps, **stats)
+
+    def _remove_oldest(self):
+        frame_time, bucket, long_frame, dropped = self._frames.popleft()
+        self._buckets[bucket] -= 1
+        self._total -= frame_time
+        self.long_frames -= long_frame
+        self.dropped_frames -= dropped
+
+
+class FramePacer(object):
+    """
+    Caps the frame rate and measures real frame times. Operating system sleeps tend to overshoot by a millisecond
+    or more, so the pacer sleeps until spin_time before the next frame is due and busy-waits the rest, which is
+    nearly as precise as pygame's tick_busy_loop without keeping the CPU busy all the time
+
+    :type max_fps: float
+    :type spin_time: float
+    :type histogram: FrameTimeHistogram
+    """
+    def __init__(self, max_fps=None, spin_time=0.002, histogram=None, clock=default_timer, sleep=time.sleep):
+        """
+        :param float max_fps: Frame cap, None for no cap
+        :param float spin_time: Seconds before the deadline from which the pacer busy-waits instead of sleeping
+        :param FrameTimeHistogram histogram: Histogram receiving frame times, a new one if None
+        :param clock: Function returning current time in seconds
+        :param sleep: Function sleeping for given number of seconds
+        """
+        if max_fps is not None and max_fps <= 0:
+            raise ValueError("Frame cap has to be positive")
+
+        self.max_fps = max_fps
+        self.spin_time = spin_time
+        self.histogram = histogram if histogram is not None else FrameTimeHistogram()
+        self.clock = clock
+        self.sleep = sleep
+        self._last = None
+        self._deadline = None
+
+    def wait(self):
+        """
+        Waits until the next frame is due, should be called once at the start of every frame
+
+        :return: Real time in seconds since the previous call, 0 for the first one
+        """
+        if self.max_fps is not None and self._last is not None:
+            period = 1.0 / self.max_fps
+            # Frames are scheduled on a fixed grid, a frame which ran late only moves the grid if it missed
+            # a whole period, otherwise the next frames would try to catch up
+            deadline = self._deadline + period if self._deadline is not None else self._last + period
+            now = self.clock()
+            if now >= deadline + period:
+                deadline = now
+            remaining = deadline - now
+            if remaining > self.spin_time:
+                self.sleep(remaining - self.spin_time)
+            while self.clock() < deadline:
+                pass
+            self._deadline = deadline
+        else:
+            self._deadline = None
+
+        now = self.clock()
+        if self._last is None:
+            self._last = now
+            return 0.0
+
+        frame_time = now - self._last
+        self._last = now
+        self.histogram.add(frame_time, 1.0 / self.max_fps if self.max_fps is not None else None)
+        return frame_time
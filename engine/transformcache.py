@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import pygame
+
+
+class TransformCache(object):
+    """
+    Bounded least recently used cache of rotated, scaled and flipped surfaces, so that objects which keep their
+    transform between frames are not transformed again every frame. Surfaces are identified by identity, a cached
+    entry keeps its source surface alive so that its id cannot be reused by another surface
+
+    :type max_bytes: int
+    :type bytes: int
+    :type hits: int
+    :type misses: int
+    :type evictions: int
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        :param int max_bytes: Memory cap of all cached surfaces' pixels
+        """
+        if max_bytes < 0:
+            raise ValueError("Memory cap cannot be negative")
+
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Key to (source, transformed surface, size in bytes)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, surface, rotation=0, scale=1, horizontal_flip=False, vertical_flip=False):
+        """
+        Returns the surface rotated, scaled and flipped. Surface itself is returned when no transformation is needed
+
+        :param pygame.Surface surface: Source surface
+        :param float rotation: Rotation in degrees
+        :param float scale: Scale
+        :param bool horizontal_flip: Flips horizontally if True
+        :param bool vertical_flip: Flips vertically if True
+        :rtype: pygame.Surface
+        """
+        if rotation % 360 == 0 and scale == 1 and not horizontal_flip and not vertical_flip:
+            return surface
+
+        key = (id(surface), rotation, scale, horizontal_flip, vertical_flip)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        transformed = surface
+        if rotation % 360 != 0:
+            transformed = pygame.transform.rotozoom(surface, rotation, scale)
+        elif scale != 1:
+            # Unlike rotozoom, scaling alone keeps the size exact, so that scaled tiles still line up
+            size = (max(int(round(surface.get_width() * scale)), 1), max(int(round(surface.get_height() * scale)), 1))
+            if surface.get_bitsize() >= 24:
+                transformed = pygame.transform.smoothscale(surface, size)
+            else:
+                transformed = pygame.transform.scale(surface, size)
+        if horizontal_flip or vertical_flip:
+            transformed = pygame.transform.flip(transformed, horizontal_flip, vertical_flip)
+
+        size = transformed.get_pitch() * transformed.get_height()
+        if size <= self.max_bytes:
+            self._entries[key] = (surface, transformed, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._evict()
+        return transformed
+
+    def resize(self, max_bytes):
+        """
+        Changes the memory cap, evicting least recently used surfaces if needed
+
+        :param int max_bytes: New memory cap
+        """
+        if max_bytes < 0:
+            raise ValueError("Memory cap cannot be negative")
+        self.max_bytes = max_bytes
+        while self.bytes > self.max_bytes:
+            self._evict()
+
+    def clear(self):
+        """
+        Drops all cached surfaces, statistics are kept
+        """
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """
+        :return: Dictionary with hits, misses, evictions, hit rate, entries count and memory usage
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": float(self.hits) / lookups if lookups > 0 else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _evict(self):
+        key, (source, transformed, size) = self._entries.popitem(last=False)
+        self.bytes -= size
+        self.evictions += 1
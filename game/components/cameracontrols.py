@@ -6,7 +6,7 @@ import logging
 class CameraControls(components.BaseComponent):
     def update(self):
         try:
-            transform = self.game_object.get_component(components.Transform)
+            transform = self.game_object.transform
             dt = self.game_object.scene.dt
             if transform is not None:
                 if Input.is_binding_pressed("forward"):
@@ -38,8 +38,7 @@ class CharacterController(BaseComponent):
                 self.flying = True
 
             test_rectangle = bounding_rectangle.move(Vector2(0, 3))
-            map_tiles = tiled_map.get_tiles_for_area(test_rectangle, collidable=True)
-            if len(map_tiles) == 0:
+            if not tiled_map.has_tiles_in_area(test_rectangle, collidable=True):
                 self.flying = True
 
         if self.flying:
@@ -77,7 +76,7 @@ class CharacterController(BaseComponent):
         transform.position = position + self.applied_velocity
 
     def _horizontal_collision(self, rectangle, tiled_map, dt_velocity):
-        if len(tiled_map.get_tiles_for_area(rectangle, collidable=True)) > 0:
+        if tiled_map.has_tiles_in_area(rectangle, collidable=True):
             self.velocity.x = 0
             dt_velocity.x = 0
 
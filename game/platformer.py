@@ -9,8 +9,8 @@ class Platformer(Application):
     def __init__(self):
         super(Platformer, self).__init__()
 
-    def init(self, width, height):
-        super(self.__class__, self).init(width, height)
+    def init(self, width, height, headless=False):
+        super(self.__class__, self).init(width, height, headless)
         self.scene = Scene(self)
 
         map_obj = GameObject()